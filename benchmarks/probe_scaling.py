@@ -0,0 +1,95 @@
+"""
+Scan time of probe_devices() over the number of adapters.
+
+Every fake adapter is a local TCP server reached through a socket:// URL,
+so the real UsbCan.identify() path runs against it. Each one answers the
+C/N/V burst after a fixed delay, like a USB-CAN Plus that takes a while to
+reply. With concurrent probing the scan time stays near one delay until
+the adapter count exceeds PROBE_WORKERS.
+
+    python benchmarks/probe_scaling.py [--delay 0.2] [--max 32]
+"""
+
+import argparse
+import os
+import socketserver
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from can_test import scanner  # noqa: E402
+
+
+class DelayedSlcanHandler(socketserver.BaseRequestHandler):
+    """Answers C, N and V after the server's delay."""
+
+    def handle(self):
+        buf = b""
+        while True:
+            data = self.request.recv(64)
+            if not data:
+                return
+            buf += data
+            *commands, buf = buf.split(b"\r")
+            for command in commands:
+                time.sleep(self.server.delay)
+                if command == b"C":
+                    self.request.sendall(b"\r")
+                elif command == b"N":
+                    self.request.sendall(b"N%08d \r" % self.server.number)
+                elif command == b"V":
+                    self.request.sendall(b"V1234\r")
+                else:
+                    self.request.sendall(b"\x07")
+
+
+class FakeAdapter(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, number, delay):
+        super().__init__(("127.0.0.1", 0), DelayedSlcanHandler)
+        self.number = number
+        self.delay = delay
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return "socket://127.0.0.1:%d" % self.server_address[1]
+
+
+def measure(count, delay):
+    adapters = [FakeAdapter(number, delay) for number in range(count)]
+    try:
+        started = time.perf_counter()
+        results = scanner.probe_devices([adapter.url for adapter in adapters])
+        elapsed = time.perf_counter() - started
+    finally:
+        for adapter in adapters:
+            adapter.shutdown()
+            adapter.server_close()
+    return elapsed, sum(result.is_ok() for result in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--delay", type=float, default=0.2,
+                        help="Reply delay per command in seconds")
+    parser.add_argument("--max", type=int, default=32,
+                        help="Largest number of fake adapters")
+    args = parser.parse_args()
+
+    print(f"Reply delay {args.delay:.2f} s per command, "
+          f"PROBE_WORKERS={scanner.PROBE_WORKERS}")
+    print(f"{'Adapters':>8} {'Scan [s]':>9} {'Found':>6}")
+    count = 1
+    while count <= args.max:
+        elapsed, found = measure(count, args.delay)
+        print(f"{count:>8} {elapsed:>9.3f} {found:>6}")
+        count *= 2
+
+
+if __name__ == "__main__":
+    main()
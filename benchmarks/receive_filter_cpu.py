@@ -0,0 +1,155 @@
+"""
+Receiver CPU time under heavy foreign traffic, with and without ID filters.
+
+A FastSlcanBus reads from an in-memory serial port a stream that mixes
+the frames of the test image (ID 0x100) with frames of other IDs, handed
+over in USB-sized chunks the way the adapter would on a busy bus. Each
+chunk is drained the way receive_image_on_bus() does it: the notifier only
+calls _DrainingNotifier._on_message_available() while the port has data,
+so frames left behind in the bus are reported as missing. Reported per
+mode: process CPU time, image frames delivered and whether the image was
+complete.
+
+    none      no filters, the receive loop skips foreign IDs itself
+    software  IMAGE_FILTERS applied by python-can inside the bus
+    hardware  the adapter drops foreign IDs (simulated: they never arrive)
+
+    python benchmarks/receive_filter_cpu.py [--foreign 20] [--runs 5]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from can import Message  # noqa: E402
+
+from can_test.fastslcan import FastSlcanBus, encode_frame  # noqa: E402
+from can_test.receive import (IMAGE_FILTERS, ImageAssembler,  # noqa: E402
+                              ReassemblyBuffer, _DrainingNotifier)
+from can_test.send import IMAGE_ARBITRATION_ID, build_image_frames  # noqa: E402
+
+# Bytes the adapter hands over per USB transfer
+USB_CHUNK = 512
+
+
+class Consumer(object):
+    """Stands in for the notifier's listeners."""
+
+    def __init__(self, check_id):
+        self.check_id = check_id
+        self.assembler = ImageAssembler(ReassemblyBuffer())
+        self.delivered = 0
+        self.result = None
+
+    def _on_message_received(self, msg):
+        if self.check_id and msg.arbitration_id != IMAGE_ARBITRATION_ID:
+            return
+        self.delivered += 1
+        result = self.assembler.feed(msg.data)
+        if result is not None:
+            self.result = result
+
+
+def build_stream(foreign_per_frame, with_foreign):
+    frames, _ = build_image_frames()
+    rng = random.Random(0)
+    foreign_ids = range(0x200, 0x800)
+    chunks = []
+    for frame in frames:
+        if with_foreign:
+            for _ in range(foreign_per_frame):
+                chunks.append(encode_frame(Message(
+                    arbitration_id=rng.choice(foreign_ids),
+                    is_extended_id=False,
+                    data=rng.randbytes(8))))
+        chunks.append(encode_frame(frame))
+    return b"".join(chunks), len(frames)
+
+
+class MemoryPort(object):
+    """Serial port stand-in without the per-byte queue of loop://."""
+
+    is_open = True
+
+    def __init__(self):
+        self.data = bytearray()
+
+    @property
+    def in_waiting(self):
+        return len(self.data)
+
+    def read(self, size=1):
+        chunk = bytes(self.data[:size])
+        del self.data[:size]
+        return chunk
+
+    def write(self, data):
+        self.data.extend(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def reset_input_buffer(self):
+        self.data.clear()
+
+    def close(self):
+        pass
+
+
+def run_once(bus, stream, filters, check_id):
+    bus.set_filters(filters)
+    bus.flush()
+    consumer = Consumer(check_id)
+    port = bus.serialPortOrig
+    started = time.process_time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for start in range(0, len(stream), USB_CHUNK):
+            port.write(stream[start:start + USB_CHUNK])
+            # Wie der Notifier: nur solange der Port lesebereit ist
+            while port.in_waiting:
+                _DrainingNotifier._on_message_available(consumer, bus)
+    return time.process_time() - started, consumer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--foreign", type=int, default=20,
+                        help="Foreign frames per image frame")
+    parser.add_argument("--runs", type=int, default=5,
+                        help="Runs per mode, the fastest one is reported")
+    args = parser.parse_args()
+
+    bus = FastSlcanBus("loop://", sleep_after_open=0)
+    bus.serialPortOrig = MemoryPort()
+    modes = [
+        ("none", None, True, True),
+        ("software", IMAGE_FILTERS, False, True),
+        ("hardware", IMAGE_FILTERS, False, False),
+    ]
+    try:
+        print(f"{args.foreign} foreign frames per image frame")
+        print(f"{'Filter':>9} {'Frames':>8} {'CPU [ms]':>9} "
+              f"{'Delivered':>10} {'Image':>6}")
+        for name, filters, check_id, with_foreign in modes:
+            stream, image_frames = build_stream(args.foreign, with_foreign)
+            runs = [run_once(bus, stream, filters, check_id)
+                    for _ in range(args.runs)]
+            cpu, consumer = min(runs, key=lambda run: run[0])
+            complete = consumer.result is not None and consumer.result.is_ok()
+            total = stream.count(b"\r")
+            print(f"{name:>9} {total:>8} {cpu * 1000:>9.1f} "
+                  f"{consumer.delivered:>5}/{image_frames:<4} "
+                  f"{'ok' if complete else 'FAIL':>6}")
+    finally:
+        bus.shutdown()
+
+
+if __name__ == "__main__":
+    main()
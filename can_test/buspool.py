@@ -0,0 +1,212 @@
+"""
+Pool of open CAN buses, one per adapter port.
+
+Opening an SLCAN adapter costs a serial open, the 2 s python-can waits for
+the adapter afterwards, the bitrate setup and opening the CAN channel. The
+pool keeps the bus of every port open between test steps and lends it out:
+a lease gets the bus with the requested bitrate and filters and hands it
+back afterwards. A bitrate change only re-sends the S command; a bus that
+failed is shut down and opened again on its next lease.
+"""
+
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Iterable, Optional
+
+import can
+import serial
+
+from .fastslcan import apply_acceptance_filter, reset_acceptance_filter
+
+CHANNEL_BAUDRATE = 3000000
+LEASE_TIMEOUT = 30.0
+# Obergrenze beim Verwerfen alter Frames vor einer Leihe
+DRAIN_LIMIT = 10000
+# Fehler, nach denen ein Bus neu geöffnet wird
+BUS_ERRORS = (can.CanError, serial.serialutil.SerialException, OSError)
+
+
+class _PooledBus(object):
+    def __init__(self):
+        self.bus: Optional[can.BusABC] = None
+        self.interface: Optional[str] = None
+        self.bitrate: Optional[int] = None
+        self.hardware_filters = None
+        self.lock = threading.Lock()
+        self.last_used = 0.0
+
+
+def _is_healthy(bus: can.BusABC) -> bool:
+    serial_port = getattr(bus, "serialPortOrig", None)
+    return serial_port is None or serial_port.is_open
+
+
+def _drain(bus: can.BusABC):
+    """Drop frames that arrived while the bus was not leased."""
+    if hasattr(bus, "serialPortOrig"):
+        bus.flush()
+    for _ in range(DRAIN_LIMIT):
+        if bus.recv(0) is None:
+            break
+
+
+class BusPool(object):
+    """Open buses keyed by port, lent out to one test step at a time."""
+
+    def __init__(self, lease_timeout: float = LEASE_TIMEOUT):
+        self.lease_timeout = lease_timeout
+        self._entries: Dict[str, _PooledBus] = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, port: str) -> _PooledBus:
+        with self._lock:
+            entry = self._entries.get(port)
+            if entry is None:
+                entry = self._entries[port] = _PooledBus()
+            return entry
+
+    @staticmethod
+    def _discard(entry: _PooledBus):
+        if entry.bus is not None:
+            try:
+                entry.bus.shutdown()
+            except Exception as e:
+                print(f"Fehler beim Schließen des CAN-Bus: {e}")
+        entry.bus = None
+        entry.hardware_filters = None
+
+    def _prepare(self, entry: _PooledBus, port: str, bitrate: int,
+                 interface: str, can_filters, hardware_filter: bool):
+        if entry.bus is not None and (entry.interface != interface
+                                      or not _is_healthy(entry.bus)):
+            self._discard(entry)
+
+        if entry.bus is not None and entry.bitrate != bitrate:
+            set_bitrate = getattr(entry.bus, "set_bitrate", None)
+            if set_bitrate is not None:
+                set_bitrate(bitrate)
+                entry.bitrate = bitrate
+            else:
+                self._discard(entry)
+
+        if entry.bus is None:
+            entry.bus = can.Bus(interface=interface,
+                                channel=f"{port}@{CHANNEL_BAUDRATE}",
+                                rtscts=True,
+                                bitrate=bitrate)
+            entry.interface = interface
+            entry.bitrate = bitrate
+
+        wanted = list(can_filters) if hardware_filter and can_filters else None
+        if wanted != entry.hardware_filters:
+            if wanted is None:
+                reset_acceptance_filter(entry.bus)
+            elif not apply_acceptance_filter(entry.bus, wanted):
+                print(f"Hardwarefilter an {port} nicht möglich, filtere in Software")
+                wanted = None
+            entry.hardware_filters = wanted
+
+        entry.bus.set_filters(can_filters)
+        _drain(entry.bus)
+
+    def acquire(self, port: str, bitrate: int, interface: str = 'slcan',
+                can_filters=None, hardware_filter: bool = False) -> can.BusABC:
+        """
+        Lease the bus of `port`, opening or reconfiguring it as needed.
+
+        The filters always apply in python-can; with `hardware_filter`
+        they are also programmed into an SLCAN adapter. Blocks while
+        another step holds the bus. Every acquire() needs a release().
+        """
+        entry = self._entry(port)
+        if not entry.lock.acquire(timeout=self.lease_timeout):
+            raise can.CanOperationError(f"Der CAN-Bus an {port} ist noch belegt")
+        try:
+            self._prepare(entry, port, bitrate, interface, can_filters,
+                          hardware_filter)
+        except BaseException:
+            self._discard(entry)
+            entry.lock.release()
+            raise
+        return entry.bus
+
+    def release(self, port: str, failed: bool = False):
+        """Return the bus of `port`; a failed bus is reopened next time."""
+        entry = self._entry(port)
+        try:
+            if failed:
+                self._discard(entry)
+            elif entry.bus is not None:
+                entry.bus.set_filters(None)
+                entry.last_used = time.monotonic()
+        finally:
+            entry.lock.release()
+
+    @contextmanager
+    def lease(self, port: str, bitrate: int, interface: str = 'slcan',
+              can_filters=None, hardware_filter: bool = False):
+        bus = self.acquire(port, bitrate, interface, can_filters,
+                           hardware_filter)
+        try:
+            yield bus
+        except BUS_ERRORS:
+            self.release(port, failed=True)
+            raise
+        except BaseException:
+            self.release(port)
+            raise
+        else:
+            self.release(port)
+
+    async def acquire_async(self, port: str, bitrate: int,
+                            interface: str = 'slcan', can_filters=None,
+                            hardware_filter: bool = False) -> can.BusABC:
+        """acquire() in a worker thread; safe against cancellation."""
+        task = asyncio.ensure_future(asyncio.to_thread(
+            self.acquire, port, bitrate, interface, can_filters,
+            hardware_filter))
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # Die Leihe kommt womöglich noch zustande und muss zurück
+            task.add_done_callback(
+                lambda done: done.cancelled() or done.exception()
+                or self.release(port))
+            raise
+
+    async def release_async(self, port: str, failed: bool = False):
+        await asyncio.to_thread(self.release, port, failed)
+
+    @asynccontextmanager
+    async def lease_async(self, port: str, bitrate: int,
+                          interface: str = 'slcan', can_filters=None,
+                          hardware_filter: bool = False):
+        bus = await self.acquire_async(port, bitrate, interface, can_filters,
+                                       hardware_filter)
+        failed = False
+        try:
+            yield bus
+        except BUS_ERRORS:
+            failed = True
+            raise
+        finally:
+            await self.release_async(port, failed)
+
+    def close(self, ports: Optional[Iterable[str]] = None):
+        """Shut down the buses of `ports`, or all of them."""
+        selected = None if ports is None else set(ports)
+        with self._lock:
+            entries = [entry for port, entry in self._entries.items()
+                       if selected is None or port in selected]
+        for entry in entries:
+            if not entry.lock.acquire(timeout=self.lease_timeout):
+                continue
+            try:
+                self._discard(entry)
+            finally:
+                entry.lock.release()
+
+
+bus_pool = BusPool()
@@ -0,0 +1,120 @@
+"""
+Command line entry point.
+
+`can_test` or `can_test serve` starts the web app as before. `can_test run`
+runs the production test without browser or web server and prints one
+JSON object per unit. Heavy modules (uvicorn, FastAPI, Jinja2, PIL,
+pymonctl, fpdf) are only imported by the commands and steps that use them.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import sys
+import time
+
+
+def serve(args):
+    from . import main as web
+
+    web.main()
+    return 0
+
+
+async def run_unit(number, args):
+    """Run the test plan for one unit and return its JSON result."""
+    from .session import sessions
+    from .testplan import production_plan, run_plan
+
+    # Jede Prüfeinheit bekommt frische Ergebnisse, die Station bleibt belegt
+    session = sessions.get("cli")
+    session.reset()
+    started = time.perf_counter()
+    plan_result = await run_plan(production_plan(
+        session, duplex=not args.sequential, vga=not args.skip_vga,
+        report=not args.skip_report))
+    return {
+        "unit": number,
+        "passed": plan_result.is_ok(),
+        "duration_s": round(time.perf_counter() - started, 2),
+        "station": session.station,
+        "steps": (plan_result.unwrap() if plan_result.is_ok()
+                  else plan_result.unwrap_err()),
+    }
+
+
+def wait_for_next_unit(timeout):
+    """Block until the adapter of the next unit has been plugged in."""
+    from .registry import start_registry
+
+    registry = start_registry()
+    ports = registry.ports()
+    generation = registry.generation
+    print("Warte auf den Wechsel der Prüfeinheit", file=sys.stderr)
+    # Erst muss ein Adapter verschwinden, dann wieder dieselbe Anzahl da sein
+    unplugged = False
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        remaining = None if deadline is None else deadline - time.monotonic()
+        if remaining is not None and remaining <= 0:
+            return False
+        generation = registry.wait_for_change(generation, remaining)
+        current = registry.ports()
+        unplugged = unplugged or len(current) < len(ports)
+        if unplugged and len(current) >= len(ports):
+            return True
+
+
+def run(args):
+    all_passed = True
+    number = 0
+    while args.units == 0 or number < args.units:
+        number += 1
+        if number > 1 and args.wait_replug:
+            if not wait_for_next_unit(args.replug_timeout):
+                print("Keine neue Prüfeinheit eingesteckt", file=sys.stderr)
+                break
+        # Die Module melden ihren Fortschritt per print(); stdout bleibt JSON
+        with contextlib.redirect_stdout(sys.stderr):
+            result = asyncio.run(run_unit(number, args))
+        print(json.dumps(result, ensure_ascii=False), flush=True)
+        all_passed = all_passed and result["passed"]
+        if args.stop_on_failure and not result["passed"]:
+            break
+    return 0 if all_passed else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="can_test",
+                                     description="Q-Leica cable test")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("serve", help="Start the web app (default)")
+    run_parser = commands.add_parser(
+        "run", help="Run the full test without the web app, JSON output")
+    run_parser.add_argument("-n", "--units", type=int, default=1,
+                            help="Number of units to test, 0 for no limit")
+    run_parser.add_argument("--wait-replug", action="store_true",
+                            help="Before each further unit, wait until an "
+                                 "adapter was unplugged and plugged in again")
+    run_parser.add_argument("--replug-timeout", type=float, default=None,
+                            help="Give up waiting for the next unit after "
+                                 "this many seconds")
+    run_parser.add_argument("--sequential", action="store_true",
+                            help="Run videosignal tests 1 and 2 one after "
+                                 "another instead of as one duplex test")
+    run_parser.add_argument("--skip-vga", action="store_true",
+                            help="Do not check for the DP-VGA adapter")
+    run_parser.add_argument("--skip-report", action="store_true",
+                            help="Do not write the PDF report")
+    run_parser.add_argument("--stop-on-failure", action="store_true",
+                            help="Stop after the first unit that fails")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        return run(args)
+    return serve(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
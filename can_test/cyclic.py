@@ -0,0 +1,53 @@
+"""
+Cyclic CAN transmission on top of python-can's broadcast manager.
+
+The interface (or python-can's cyclic send thread for interfaces without
+hardware support) repeats the frames, so heartbeat traffic needs no Python
+loop per frame.
+"""
+
+from typing import Iterable, List, Sequence, Tuple, Union
+
+import can
+
+HEARTBEAT_PERIOD = 0.5
+
+CyclicEntry = Tuple[Union[can.Message, Sequence[can.Message]], float]
+
+
+def counter_messages(msg: can.Message, index: int = -1) -> List[can.Message]:
+    """
+    The 256 variants of `msg` with byte `index` counting up from its
+    current value + 1, wrapping at 0xFF.
+
+    Passed to send_periodic() as a sequence, the counter runs without any
+    per-period Python code.
+    """
+    start = msg.data[index]
+    messages = []
+    for step in range(1, 257):
+        data = bytearray(msg.data)
+        data[index] = (start + step) & 0xFF
+        messages.append(can.Message(arbitration_id=msg.arbitration_id,
+                                    is_extended_id=msg.is_extended_id,
+                                    data=data))
+    return messages
+
+
+def start_cyclic(bus: can.BusABC,
+                 schedule: Iterable[CyclicEntry]) -> List[can.broadcastmanager.CyclicSendTaskABC]:
+    """
+    Start one periodic task per (message(s), period) entry.
+
+    Every entry has its own period. Tasks that implement
+    ModifiableCyclicTaskABC can be updated with modify_data() while they
+    run, without restarting them.
+    """
+    return [bus.send_periodic(messages, period, store_task=True)
+            for messages, period in schedule]
+
+
+def stop_cyclic(tasks: Iterable[can.broadcastmanager.CyclicSendTaskABC]):
+    """Stop all given periodic tasks."""
+    for task in tasks:
+        task.stop()
@@ -0,0 +1,109 @@
+"""
+Persistent cache of identified USB-CAN adapters.
+
+Serial number, firmware and hardware version of a plugged-in adapter never
+change, so a scan only has to interrogate ports it has not seen before.
+Entries are keyed by USB location and FTDI serial and carry a fingerprint
+(tty name plus the kernel's USB device number, which changes on every
+replug) so a replugged or swapped adapter is probed again.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+
+def default_cache_path() -> Path:
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "can_test" / "devices.json"
+
+
+def _read_sysfs(path: Optional[str], name: str) -> str:
+    if not path:
+        return ""
+    try:
+        with open(os.path.join(path, name), "r") as fh:
+            return fh.read().strip()
+    except OSError:
+        return ""
+
+
+def cache_key(port_info) -> Optional[str]:
+    """Key for a pyserial ListPortInfo, None if it cannot be identified."""
+    location = getattr(port_info, "location", None)
+    usb_serial = getattr(port_info, "serial_number", None)
+    if not location and not usb_serial:
+        return None
+    return f"{location or ''}|{usb_serial or ''}"
+
+
+def fingerprint(port_info) -> str:
+    """Value that changes whenever the adapter behind a port is replugged."""
+    usb_path = getattr(port_info, "usb_device_path", None)
+    busnum = _read_sysfs(usb_path, "busnum")
+    devnum = _read_sysfs(usb_path, "devnum")
+    return f"{port_info.device}|{busnum}:{devnum}"
+
+
+class DeviceCache(object):
+    """On-disk map from adapter identity to the last FoundDevice result."""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else default_cache_path()
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._entries is None:
+            try:
+                with open(self.path, "r") as fh:
+                    self._entries = json.load(fh)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w") as fh:
+                json.dump(self._entries, fh, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as err:
+            print(f"Gerätecache konnte nicht gespeichert werden: {err}")
+
+    def get(self, port_info) -> Optional[Dict[str, Any]]:
+        """Return the cached device for a port, None on miss or replug."""
+        key = cache_key(port_info)
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._load().get(key)
+        if entry is None or entry.get("fingerprint") != fingerprint(port_info):
+            return None
+        return entry["device"]
+
+    def put(self, port_info, device: Dict[str, Any]):
+        """Store a successfully identified device."""
+        key = cache_key(port_info)
+        if key is None:
+            return
+        with self._lock:
+            self._load()[key] = {
+                "fingerprint": fingerprint(port_info),
+                "device": dict(device),
+            }
+            self._save()
+
+    def invalidate(self, port_infos: Optional[Iterable] = None):
+        """Drop the given ports, or everything if none are given."""
+        with self._lock:
+            entries = self._load()
+            if port_infos is None:
+                entries.clear()
+            else:
+                for port_info in port_infos:
+                    entries.pop(cache_key(port_info), None)
+            self._save()
@@ -0,0 +1,199 @@
+"""
+High-throughput SLCAN backend.
+
+The stock slcan interface writes and flushes every frame separately and
+reads the serial port one byte at a time. FastSlcanBus keeps its command
+handling but reads everything the adapter has buffered in one call, decodes
+all complete frames from it at once and can write a burst of frames with a
+single write. It is registered as the python-can interface "fastslcan".
+"""
+
+import binascii
+import time
+from collections import deque
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import serial
+from can import BusABC, Message
+from can.typechecking import CanFilter
+from can.exceptions import error_check
+from can.interfaces.slcan import slcanBus
+
+READ_CHUNK = 4096
+STD_ID_MASK = 0x7FF
+# Power-on-Werte der Akzeptanzregister: alle IDs durchlassen
+ACCEPT_ALL = (0x00000000, 0xFFFFFFFF)
+_FRAME_TYPES = frozenset(b"tTrRx")
+
+
+def encode_frame(msg: Message) -> bytes:
+    """SLCAN ASCII encoding of a frame, including the trailing CR."""
+    if msg.is_remote_frame:
+        if msg.is_extended_id:
+            return b"R%08X%d\r" % (msg.arbitration_id, msg.dlc)
+        return b"r%03X%d\r" % (msg.arbitration_id, msg.dlc)
+    data = binascii.hexlify(msg.data).upper()
+    if msg.is_extended_id:
+        return b"T%08X%d%s\r" % (msg.arbitration_id, msg.dlc, data)
+    return b"t%03X%d%s\r" % (msg.arbitration_id, msg.dlc, data)
+
+
+def decode_frames(buf: bytearray, timestamp: float) -> List[Message]:
+    """
+    Decode and remove all complete lines from `buf`.
+
+    Command replies (bare CR/BEL, z/Z transmit acknowledgements) are
+    dropped; an incomplete last line stays in the buffer.
+    """
+    end = max(buf.rfind(b"\r"), buf.rfind(b"\a"))
+    if end < 0:
+        return []
+    lines = bytes(buf[:end + 1]).replace(b"\a", b"\r").split(b"\r")
+    del buf[:end + 1]
+
+    messages = []
+    for line in lines:
+        if not line or line[0] not in _FRAME_TYPES:
+            continue
+        kind = line[0]
+        try:
+            if kind in b"tr":
+                can_id = int(line[1:4], 16)
+                dlc = line[4] - 48
+                data_start = 5
+                extended = False
+            else:
+                can_id = int(line[1:9], 16)
+                dlc = line[9] - 48
+                data_start = 10
+                extended = True
+            remote = kind in b"rR"
+            data = (None if remote else
+                    binascii.unhexlify(line[data_start:data_start + 2 * dlc]))
+        except (ValueError, IndexError, binascii.Error):
+            continue
+        messages.append(Message(arbitration_id=can_id,
+                                is_extended_id=extended,
+                                is_remote_frame=remote,
+                                timestamp=timestamp,
+                                dlc=dlc,
+                                data=data))
+    return messages
+
+
+class FastSlcanBus(slcanBus):
+    """slcan interface with bulk reads and coalesced writes."""
+
+    def __init__(self, channel, **kwargs):
+        self._pending = deque()
+        super().__init__(channel, **kwargs)
+
+    def _next_pending(self) -> Optional[Message]:
+        # Filter here: BusABC.recv(0) gives up after one rejected frame,
+        # which would strand the rest of a bulk read in _pending.
+        while self._pending:
+            msg = self._pending.popleft()
+            if self._matches_filters(msg):
+                return msg
+        return None
+
+    def _recv_internal(
+        self, timeout: Optional[float]
+    ) -> Tuple[Optional[Message], bool]:
+        msg = self._next_pending()
+        if msg is not None:
+            return msg, True
+
+        _timeout = serial.Timeout(timeout)
+        with error_check("Could not read from serial device"):
+            while True:
+                in_waiting = self.serialPortOrig.in_waiting
+                chunk = self.serialPortOrig.read(
+                    min(in_waiting, READ_CHUNK) if in_waiting else 1)
+                if chunk:
+                    self._buffer.extend(chunk)
+                    self._pending.extend(
+                        decode_frames(self._buffer, time.time()))
+                    msg = self._next_pending()
+                    if msg is not None:
+                        return msg, True
+                if _timeout.expired():
+                    return None, True
+
+    def flush(self) -> None:
+        self._pending.clear()
+        super().flush()
+
+    def send(self, msg: Message, timeout: Optional[float] = None) -> None:
+        self.send_burst((msg,), timeout)
+
+    def send_burst(self, msgs: Iterable[Message],
+                   timeout: Optional[float] = None) -> None:
+        """Send several frames with a single serial write."""
+        if timeout != self.serialPortOrig.write_timeout:
+            self.serialPortOrig.write_timeout = timeout
+        with error_check("Could not write to serial device"):
+            self.serialPortOrig.write(b"".join(encode_frame(msg)
+                                               for msg in msgs))
+
+
+def _dual_filter_half(can_id: int, can_mask: int) -> Tuple[int, int]:
+    # ID10..0 in the upper 11 bits; RTR and the data nibble are "don't care"
+    code = (can_id & STD_ID_MASK) << 5
+    mask = ((~can_mask & STD_ID_MASK) << 5) | 0x1F
+    return code, mask
+
+
+def acceptance_registers(filters: Sequence[CanFilter]) -> Optional[Tuple[int, int]]:
+    """
+    SJA1000 acceptance code and mask (dual filter mode, as used by the
+    Lawicel M/m commands) for up to two standard-ID filters.
+
+    More than two filters are merged into one that accepts their common
+    bits. Returns None if the filters cannot be expressed in hardware
+    (no filters, or extended IDs).
+    """
+    if not filters or any(f.get("extended") for f in filters):
+        return None
+
+    pairs = [(f["can_id"] & f["can_mask"], f["can_mask"]) for f in filters]
+    if len(pairs) > 2:
+        merged_id, merged_mask = pairs[0]
+        for can_id, can_mask in pairs[1:]:
+            merged_mask &= can_mask & ~(merged_id ^ can_id)
+            merged_id &= merged_mask
+        pairs = [(merged_id, merged_mask)]
+
+    code1, mask1 = _dual_filter_half(*pairs[0])
+    code2, mask2 = _dual_filter_half(*pairs[-1])
+    return (code1 << 16) | code2, (mask1 << 16) | mask2
+
+
+def apply_acceptance_filter(bus: BusABC, filters: Sequence[CanFilter]) -> bool:
+    """
+    Program the adapter's acceptance filter with the M/m commands.
+
+    Only SLCAN buses are supported; the channel is closed while the
+    registers are written. Returns False if nothing was programmed, in
+    which case python-can's software filtering still applies.
+    """
+    registers = acceptance_registers(filters)
+    if registers is None or not isinstance(bus, slcanBus):
+        return False
+    _write_acceptance_registers(bus, *registers)
+    return True
+
+
+def reset_acceptance_filter(bus: BusABC) -> bool:
+    """Let an SLCAN adapter accept all IDs again."""
+    if not isinstance(bus, slcanBus):
+        return False
+    _write_acceptance_registers(bus, *ACCEPT_ALL)
+    return True
+
+
+def _write_acceptance_registers(bus: slcanBus, code: int, mask: int):
+    bus.close()
+    bus._write(f"M{code:08X}")
+    bus._write(f"m{mask:08X}")
+    bus.open()
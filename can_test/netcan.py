@@ -0,0 +1,251 @@
+"""
+NetCAN Plus discovery and probing.
+
+discover_netcans() sends one SSDP M-SEARCH per interface from a single
+event loop, collects the answers until they settle and fetches the device
+descriptions concurrently. probe_netcans() identifies adapters over TCP
+with the same pipelined C/N/V handshake as UsbCan.identify().
+"""
+
+import asyncio
+import ipaddress
+import socket
+import urllib.request
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import netifaces
+from result import Err, Result
+
+from .scanner import (IDENTIFY_BURST, MCAST_GRP, MCAST_PORT, FoundDevice,
+                      SlcanReplyParser, identified_device,
+                      parse_device_description, split_identify_replies)
+
+SSDP_MX = 1
+M_SEARCH = ("M-SEARCH * HTTP/1.1\r\n"
+            f"HOST: {MCAST_GRP}:{MCAST_PORT}\r\n"
+            "MAN: \"ssdp:discover\"\r\n"
+            f"MX: {SSDP_MX}\r\n"
+            "ST: upnp:rootdevice\r\n"
+            "\r\n").encode("ascii")
+DESCRIPTION_TIMEOUT = 2.0
+# Default TCP port of the NetCAN Plus ASCII interface.
+NETCAN_TCP_PORT = 2001
+CONNECT_TIMEOUT = 1.0
+IDENTIFY_TIMEOUT = 1.0
+PROBE_CONCURRENCY = 32
+
+# LOCATION -> parsed devinfo.xml (None for devices that are no NET-CAN).
+_description_cache: Dict[str, Optional[dict]] = {}
+
+
+def interface_addresses() -> List[str]:
+    """IPv4 addresses of all non-loopback interfaces."""
+    addrs = []
+    for iface in netifaces.interfaces():
+        for item in netifaces.ifaddresses(iface).get(netifaces.AF_INET, []):
+            addr = item.get("addr")
+            if addr and not addr.startswith("127."):
+                addrs.append(addr)
+
+    return addrs
+
+
+def parse_location(buf: bytes) -> Optional[str]:
+    """Return the LOCATION header of an SSDP message."""
+    for line in buf.split(b"\r\n"):
+        name, sep, value = line.partition(b":")
+        if sep and name.strip().upper() == b"LOCATION":
+            return value.strip().decode("utf-8", "replace")
+
+    return None
+
+
+class _SsdpProtocol(asyncio.DatagramProtocol):
+    def __init__(self, on_location):
+        self.on_location = on_location
+
+    def datagram_received(self, data, addr):
+        if b"devinfo.xml" not in data:
+            return
+        location = parse_location(data)
+        if location:
+            self.on_location(location, addr[0])
+
+
+def _fetch_description(location: str) -> Optional[dict]:
+    with urllib.request.urlopen(location,
+                                timeout=DESCRIPTION_TIMEOUT) as response:
+        return parse_device_description(response.read().decode("utf-8"))
+
+
+async def fetch_description(location: str) -> Optional[dict]:
+    """Fetch and parse a device description, cached by LOCATION."""
+    if location not in _description_cache:
+        loop = asyncio.get_running_loop()
+        dev = await loop.run_in_executor(None, _fetch_description, location)
+        _description_cache[location] = dev
+    return _description_cache[location]
+
+
+async def _open_search_socket(addr, protocol_factory):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM,
+                         socket.IPPROTO_UDP)
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF,
+                    socket.inet_aton(addr))
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 2)
+    sock.bind((addr, 0))
+    sock.setblocking(False)
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(protocol_factory,
+                                                       sock=sock)
+    return transport
+
+
+async def discover_netcans(timeout: float = SSDP_MX + 0.2,
+                           settle: float = 0.3) -> List[dict]:
+    """
+    Discover NetCAN Plus devices on all interfaces.
+
+    Returns once no new device has answered for `settle` seconds after the
+    first answer, or after `timeout` seconds at the latest.
+    """
+    loop = asyncio.get_running_loop()
+    seen: Dict[str, str] = {}
+    fetches = []
+    last_answer = [None]
+
+    def on_location(location, ip):
+        last_answer[0] = loop.time()
+        if location in seen:
+            return
+        seen[location] = ip
+        fetches.append(asyncio.ensure_future(fetch_description(location)))
+
+    transports = []
+    for addr in interface_addresses():
+        try:
+            transport = await _open_search_socket(
+                addr, lambda: _SsdpProtocol(on_location))
+        except OSError as err:
+            print(f"M-SEARCH auf {addr} nicht möglich: {err}")
+            continue
+        transport.sendto(M_SEARCH, (MCAST_GRP, MCAST_PORT))
+        transports.append(transport)
+
+    deadline = loop.time() + timeout
+    try:
+        while transports and loop.time() < deadline:
+            await asyncio.sleep(0.05)
+            if (last_answer[0] is not None
+                    and loop.time() - last_answer[0] >= settle):
+                break
+    finally:
+        for transport in transports:
+            transport.close()
+
+    netcans = []
+    descriptions = await asyncio.gather(*fetches, return_exceptions=True)
+    for (location, ip), dev in zip(seen.items(), descriptions):
+        if isinstance(dev, Exception):
+            print(f"Gerätebeschreibung {location} nicht lesbar: {dev}")
+            continue
+        if dev:
+            netcans.append(dict(dev, ip=ip))
+
+    return netcans
+
+
+def expand_targets(targets: Iterable[str],
+                   port: int = NETCAN_TCP_PORT) -> List[Tuple[str, int]]:
+    """
+    Turn hosts, host:port pairs, socket:// URLs and CIDR ranges into a
+    list of (host, port) tuples, keeping the given order.
+    """
+    expanded = []
+    for target in targets:
+        target = target.strip()
+        if target.startswith("socket://"):
+            target = target[len("socket://"):]
+        if "/" in target:
+            network = ipaddress.ip_network(target, strict=False)
+            hosts = list(network.hosts()) or [network.network_address]
+            expanded.extend((str(host), port) for host in hosts)
+        elif ":" in target:
+            host, _, host_port = target.rpartition(":")
+            expanded.append((host, int(host_port)))
+        else:
+            expanded.append((target, port))
+
+    return expanded
+
+
+async def probe_netcan(host: str, port: int = NETCAN_TCP_PORT,
+                       timeout: float = IDENTIFY_TIMEOUT
+                       ) -> Result[FoundDevice, str]:
+    """Identify a NetCAN Plus over TCP."""
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port), CONNECT_TIMEOUT)
+    except (OSError, asyncio.TimeoutError) as err:
+        return Err(f"Failed to connect: {err or 'timeout'}")
+
+    try:
+        writer.write(IDENTIFY_BURST)
+        await writer.drain()
+
+        parser = SlcanReplyParser()
+        replies = []
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while len(replies) < 3:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                chunk = await asyncio.wait_for(reader.read(256), remaining)
+            except asyncio.TimeoutError:
+                break
+            if not chunk:
+                break
+            replies.extend(parser.feed(chunk))
+    except OSError as err:
+        return Err(f"Connection failed: {err}")
+    finally:
+        writer.close()
+
+    if len(replies) < 3:
+        return identified_device(None)
+    return identified_device(split_identify_replies(replies))
+
+
+def limited_probe(concurrency: Optional[int] = None):
+    """
+    probe_netcan() behind a shared semaphore: all probes made through the
+    returned function together keep at most `concurrency` (default
+    PROBE_CONCURRENCY) connections open.
+    """
+    semaphore = asyncio.Semaphore(concurrency or PROBE_CONCURRENCY)
+
+    async def probe(host: str, port: int = NETCAN_TCP_PORT
+                    ) -> Result[FoundDevice, str]:
+        async with semaphore:
+            return await probe_netcan(host, port)
+
+    return probe
+
+
+async def probe_netcans(targets: Iterable[str],
+                        port: int = NETCAN_TCP_PORT,
+                        concurrency: Optional[int] = None
+                        ) -> List[Tuple[str, Result[FoundDevice, str]]]:
+    """
+    Probe all targets concurrently, at most `concurrency` at a time.
+
+    Returns (socket:// URL, result) pairs in target order.
+    """
+    probe = limited_probe(concurrency)
+    addresses = expand_targets(targets, port)
+    results = await asyncio.gather(
+        *(probe(host, host_port) for host, host_port in addresses))
+    return [(f"socket://{host}:{host_port}", result)
+            for (host, host_port), result in zip(addresses, results)]
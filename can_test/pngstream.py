@@ -0,0 +1,116 @@
+"""
+Incremental PNG validation for images received over CAN.
+
+PngStreamValidator checks the signature, chunk layout, chunk CRCs and the
+zlib stream of the IDAT chunks while the bytes arrive, so a corrupted
+transfer fails at the first bad chunk. The image size is known as soon as
+the IEND chunk is complete.
+"""
+
+import struct
+import zlib
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# PNG begrenzt Chunklängen auf 2^31 - 1
+MAX_CHUNK_LENGTH = 2 ** 31 - 1
+
+_SIGNATURE = "signature"
+_HEADER = "header"
+_DATA = "data"
+_CRC = "crc"
+_DONE = "done"
+
+
+class PngError(Exception):
+    """The received data is not a valid PNG."""
+
+
+class PngStreamValidator(object):
+    """Validate a PNG byte stream piece by piece."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Prepare for a new image."""
+        self.total = 0
+        self.chunks = 0
+        self._state = _SIGNATURE
+        self._field = bytearray()
+        self._chunk_type = None
+        self._remaining = 0
+        self._crc = 0
+        self._inflate = zlib.decompressobj()
+
+    @property
+    def complete(self):
+        """True once the IEND chunk has been validated."""
+        return self._state == _DONE
+
+    def feed(self, data):
+        """
+        Validate the next bytes of the stream.
+
+        Returns True once the image is complete; bytes after IEND (frame
+        padding) are ignored. Raises PngError at the first invalid byte.
+        """
+        view = memoryview(data)
+        pos = 0
+        while pos < len(view) and self._state != _DONE:
+            if self._state == _DATA:
+                piece = view[pos:pos + self._remaining]
+                self._crc = zlib.crc32(piece, self._crc)
+                if self._chunk_type == b'IDAT':
+                    try:
+                        self._inflate.decompress(piece)
+                    except zlib.error as err:
+                        raise PngError(f"Bilddaten beschädigt: {err}")
+                self._remaining -= len(piece)
+                pos += len(piece)
+                if self._remaining == 0:
+                    self._state = _CRC
+                continue
+
+            need = 4 if self._state == _CRC else 8
+            take = min(need - len(self._field), len(view) - pos)
+            self._field += view[pos:pos + take]
+            pos += take
+            if len(self._field) < need:
+                break
+            field = bytes(self._field)
+            self._field.clear()
+            self._handle_field(field, self.total + pos)
+
+        self.total += pos
+        return self._state == _DONE
+
+    def _handle_field(self, field, offset):
+        if self._state == _SIGNATURE:
+            if field != PNG_SIGNATURE:
+                raise PngError("Keine PNG-Signatur")
+            self._state = _HEADER
+        elif self._state == _HEADER:
+            length, chunk_type = struct.unpack(">I4s", field)
+            if not chunk_type.isalpha():
+                raise PngError(f"Ungültiger Chunktyp {chunk_type!r}")
+            if self.chunks == 0 and chunk_type != b'IHDR':
+                raise PngError("IHDR fehlt")
+            if length > MAX_CHUNK_LENGTH:
+                raise PngError(f"Ungültige Chunklänge {length}")
+            self._chunk_type = chunk_type
+            self._remaining = length
+            self._crc = zlib.crc32(chunk_type)
+            self._state = _DATA if length else _CRC
+        elif self._state == _CRC:
+            (crc,) = struct.unpack(">I", field)
+            if crc != self._crc:
+                raise PngError(
+                    f"CRC-Fehler in Chunk {self._chunk_type.decode()} "
+                    f"bei Byte {offset}")
+            self.chunks += 1
+            if self._chunk_type == b'IEND':
+                if not self._inflate.eof:
+                    raise PngError("Bilddaten unvollständig")
+                self._state = _DONE
+            else:
+                self._state = _HEADER
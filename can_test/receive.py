@@ -5,18 +5,296 @@ import serial
 import sys
 import threading
 import time
+import asyncio
 import base64
-from PIL import Image
+import hashlib
 import io
 
 from pathlib import Path
 
+from typing import Optional
+from typing_extensions import TypedDict
+from result import Err, Ok, Result
+
+from .buspool import BUS_ERRORS, bus_pool
+from .pngstream import PNG_SIGNATURE, PngError, PngStreamValidator
+from .send import IMAGE_ARBITRATION_ID, REVERSE_ARBITRATION_ID
+
 # Get the base directory (where pyproject.toml is)
 BASE_DIR = Path(__file__).resolve().parent.parent
+RECEIVED_IMAGE_PATH = BASE_DIR / "can_test/static/received_colorbars.png"
+# Im Vollduplex-Test empfangenes Bild der Gegenrichtung
+REVERSE_IMAGE_PATH = BASE_DIR / "can_test/static/received_colorbars_reverse.png"
+# Obergrenze für ein übertragenes Bild
+MAX_PAYLOAD_SIZE = 64 * 1024
+RECEIVE_TIMEOUT = 10.0
+
+
+def received_image_path(port):
+    """Ablage des an `port` empfangenen Bilds, damit Stationen sich nicht überschreiben."""
+    return RECEIVED_IMAGE_PATH.with_name(f"received_{Path(port).name}.png")
+
+
+def image_filters(arbitration_id):
+    """Filter, die nur die Frames eines Testbilds durchlassen."""
+    return [{"can_id": arbitration_id, "can_mask": 0x7FF, "extended": False}]
+
+
+# Nur die Frames des Testbilds erreichen die Empfangsschleife
+IMAGE_FILTERS = image_filters(IMAGE_ARBITRATION_ID)
+REVERSE_FILTERS = image_filters(REVERSE_ARBITRATION_ID)
+
+
+class ReassemblyBuffer:
+    """
+    Vorab allokierter Puffer für eine Bildübertragung.
+
+    Frames werden per memoryview an ihren Offset geschrieben; der Puffer
+    wird für alle Übertragungen wiederverwendet, sodass pro Frame nichts
+    allokiert wird.
+    """
+
+    def __init__(self, capacity=MAX_PAYLOAD_SIZE):
+        self._buf = bytearray(capacity)
+        self._view = memoryview(self._buf)
+        self.length = 0
+
+    @property
+    def capacity(self):
+        return len(self._buf)
+
+    def reset(self):
+        self.length = 0
+
+    def write(self, data):
+        """Hängt einen Frame an, False wenn der Puffer voll ist."""
+        end = self.length + len(data)
+        if end > len(self._buf):
+            return False
+        self._view[self.length:end] = data
+        self.length = end
+        return True
+
+    def view(self):
+        """Die bisher empfangenen Bytes ohne Kopie."""
+        return self._view[:self.length]
+
+
+# Ein Puffer pro Port, damit beide Adapter gleichzeitig empfangen können
+_buffers = {}
+_buffers_lock = threading.Lock()
+
+
+def reassembly_buffer(port):
+    """Der wiederverwendete Empfangspuffer für einen Port."""
+    with _buffers_lock:
+        buffer = _buffers.get(port)
+        if buffer is None:
+            buffer = _buffers[port] = ReassemblyBuffer()
+        return buffer
+
+
+class ReceivedImage(TypedDict):
+    size: int
+    path: str
+    duration_s: float
+    sha256: str
+
+
+class ImageAssembler:
+    """
+    Setzt ein per CAN übertragenes PNG aus Frames zusammen.
+
+    feed() liefert None, solange das Bild unvollständig ist, Ok(Größe)
+    sobald der IEND-Chunk geprüft ist und Err bei einer fehlerhaften
+    Übertragung. Danach wartet der Assembler auf die nächste PNG-Signatur.
+    """
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.validator = PngStreamValidator()
+        self.started = False
+        self.started_at = None
+        self.finished_at = None
+
+    def feed(self, data) -> Optional[Result[int, str]]:
+        if not self.started:
+            if data[0:8] != PNG_SIGNATURE:
+                return None
+            self.buffer.reset()
+            self.validator.reset()
+            self.started = True
+            self.started_at = time.perf_counter()
+            print("PNG Header erkannt - Starte Sammlung")
+
+        # Die Größe ergibt sich aus dem PNG selbst (IEND-Chunk)
+        try:
+            complete = self.validator.feed(data)
+        except PngError as e:
+            self.started = False
+            return Err(f"Fehlerhafte Übertragung nach {self.buffer.length} Bytes: {e}")
+
+        if not self.buffer.write(data):
+            self.started = False
+            return Err(f"Bild größer als {self.buffer.capacity} Bytes")
+
+        if self.buffer.length % 400 == 0:
+            print(f"Empfangen: {self.buffer.length} Bytes")
+
+        if not complete:
+            return None
+        self.started = False
+        self.finished_at = time.perf_counter()
+        return Ok(self.validator.total)
+
+    def image(self):
+        """Die Bytes des zuletzt vollständig empfangenen Bildes."""
+        return self.buffer.view()[:self.validator.total]
+
+
+def save_received_image(assembler, path=RECEIVED_IMAGE_PATH) -> ReceivedImage:
+    """Speichert das zuletzt empfangene Bild unter `path`."""
+    with open(path, 'wb') as f:
+        f.write(assembler.image())
+    size = assembler.validator.total
+    print(f"Bild erfolgreich gespeichert ({size} Bytes)")
+    return {
+        "size": size,
+        "path": str(path),
+        "duration_s": assembler.finished_at - assembler.started_at,
+        "sha256": hashlib.sha256(assembler.image()).hexdigest(),
+    }
+
+
+class _DrainingNotifier(can.Notifier):
+    """
+    Notifier, der pro Lesebereitschaft alle gepufferten Nachrichten abholt.
+
+    Backends mit Blocklesen (fastslcan) halten bereits dekodierte Frames im
+    Speicher; der Dateideskriptor meldet sich dafür nicht erneut. Ein
+    Fehler des Busses wird wie im Empfangsthread von can.Notifier in
+    `exception` festgehalten, statt im Exception-Handler der Event-Loop zu
+    verschwinden.
+    """
+
+    def _on_message_available(self, bus):
+        try:
+            while (msg := bus.recv(0)) is not None:
+                self._on_message_received(msg)
+        except Exception as exc:
+            self.exception = exc
+            # Ein defekter Bus meldet sich sonst in einer Schleife
+            for reader in self._readers:
+                if isinstance(reader, int):
+                    self._loop.remove_reader(reader)
+            self._on_error(exc)
+
+
+class _BusErrorListener(can.Listener):
+    """Löst `error` mit dem ersten Busfehler auf, den der Notifier meldet."""
+
+    def __init__(self, loop):
+        self._loop = loop
+        self.error = loop.create_future()
+
+    def on_message_received(self, msg):
+        pass
+
+    def on_error(self, exc):
+        # Der Empfangsthread meldet aus einem anderen Thread
+        self._loop.call_soon_threadsafe(self._set_error, exc)
+
+    def _set_error(self, exc):
+        if not self.error.done():
+            self.error.set_result(exc)
+
+
+async def receive_image_async(port, bitrate, timeout=RECEIVE_TIMEOUT,
+                              interface='slcan', can_filters=IMAGE_FILTERS,
+                              hardware_filter=False, ready=None,
+                              path=RECEIVED_IMAGE_PATH) -> Result[ReceivedImage, str]:
+    """
+    Leiht den Bus an `port` aus dem Pool und empfängt ein Bild mit
+    receive_image_on_bus().
+
+    Die Filter wirken immer in python-can; mit `hardware_filter` werden
+    sie zusätzlich per M/m-Befehl im SLCAN-Adapter gesetzt, sodass fremde
+    IDs gar nicht erst über die serielle Schnittstelle kommen. Nur nach
+    einem Fehler des Busses selbst wird er beim nächsten Mal neu geöffnet;
+    ein Timeout oder ein fehlerhaftes Bild der Gegenstelle lässt ihn im
+    Pool.
+    """
+    try:
+        bus = await bus_pool.acquire_async(port, bitrate, interface,
+                                           can_filters, hardware_filter)
+    except BUS_ERRORS as e:
+        return Err(f"Der CAN-Bus an {port} konnte nicht geöffnet werden: {e}")
+
+    failed = False
+    try:
+        return await receive_image_on_bus(bus, port, timeout, ready, path)
+    except BUS_ERRORS as e:
+        failed = True
+        return Err(f"Der CAN-Bus an {port} ist ausgefallen: {e}")
+    finally:
+        await bus_pool.release_async(port, failed)
+
+
+async def receive_image_on_bus(bus, port, timeout=RECEIVE_TIMEOUT, ready=None,
+                               path=RECEIVED_IMAGE_PATH) -> Result[ReceivedImage, str]:
+    """
+    Empfängt ein Bild ereignisgesteuert in der laufenden Event-Loop.
+
+    Der Bus wird über can.Notifier am Dateideskriptor der Schnittstelle
+    beobachtet, es wird also nicht gepollt. Liefert das unter `path`
+    gespeicherte Bild, sobald es vollständig und gültig ist, oder einen
+    Fehler bei der ersten fehlerhaften Übertragung bzw. nach `timeout`
+    Sekunden. Das optionale asyncio.Event `ready` wird gesetzt, sobald
+    empfangen wird. Der Bus bleibt geöffnet; fällt er während des Empfangs
+    aus, wird sein Fehler (BUS_ERRORS) sofort ausgelöst.
+    """
+    loop = asyncio.get_running_loop()
+    reader = can.AsyncBufferedReader()
+    errors = _BusErrorListener(loop)
+    notifier = _DrainingNotifier(bus, [reader, errors], timeout=0.1, loop=loop)
+    assembler = ImageAssembler(reassembly_buffer(port))
+    if ready is not None:
+        ready.set()
+
+    async def collect():
+        async for msg in reader:
+            result = assembler.feed(msg.data)
+            if result is not None:
+                return result
+
+    collect_task = asyncio.ensure_future(collect())
+    try:
+        done, _ = await asyncio.wait({collect_task, errors.error}, timeout=timeout,
+                                     return_when=asyncio.FIRST_COMPLETED)
+        if errors.error in done:
+            error = errors.error.result()
+            if isinstance(error, BUS_ERRORS):
+                raise error
+            return Err(f"Fehler beim Empfangen: {error}")
+        if not done:
+            return Err(f"Kein vollständiges Bild innerhalb von {timeout:g}s empfangen")
+        result = collect_task.result()
+    finally:
+        collect_task.cancel()
+        notifier.stop()
+
+    if result.is_err():
+        return result
+    try:
+        return Ok(await asyncio.to_thread(save_received_image, assembler, path))
+    except OSError as e:
+        return Err(f"Fehler beim Speichern: {e}")
 
 
 def receive_can_frames(port, bitrate, stop_event):
     """Receive CAN frames."""
+    from PIL import Image
+
     try:
         bus = can.interface.Bus(interface='slcan',
                                 channel=f"{port}@3000000",
@@ -33,7 +311,7 @@ def receive_can_frames(port, bitrate, stop_event):
             msg = bus.recv(timeout=0.1)
             if msg is not None:
                 # Bytes aus der CAN-Nachricht extrahieren
-                bytes_received = bytes(list(msg.data))
+                bytes_received = msg.data
 
                 # Bytes in ein Bild umwandeln und speichern
                 image = Image.open(io.BytesIO(bytes_received))
@@ -44,8 +322,6 @@ def receive_can_frames(port, bitrate, stop_event):
                 data = " ".join([f"{byte:02X}" for byte in msg.data])
                 print(
                     f"ID: {msg.arbitration_id:X} [DLC: {msg.dlc}] Data: {data}")
-            else:
-                print("No message received")
         except can.CanError:
             print("CAN error occurred")
         except Exception as e:
@@ -55,59 +331,40 @@ def receive_can_frames(port, bitrate, stop_event):
     bus.shutdown()
 
 
-def receive_image_over_can(port, bitrate, stop_event):
+def receive_image_over_can(port, bitrate, stop_event, interface='slcan',
+                           can_filters=IMAGE_FILTERS, hardware_filter=False):
     try:
-        bus = can.Bus(interface='slcan',
-                      channel=f"{port}@3000000",
-                      rtscts=True,
-                      bitrate=bitrate)
+        bus = bus_pool.acquire(port, bitrate, interface, can_filters,
+                               hardware_filter)
+    except BUS_ERRORS as e:
+        print(f"Fehler beim Empfangen: {e}")
+        return
 
+    failed = False
+    try:
         print("Bereit zum Empfangen des Bildes")
-        collected_data = bytearray()
-        bytes_received = 0
-        expected_size = 3120  # Bekannte Bildgröße
-        png_started = False
-
-        # Konstruiere den korrekten Pfad für das Bild
-        image_path = BASE_DIR / "can_test/static/received_colorbars.png"
+        assembler = ImageAssembler(reassembly_buffer(port))
 
         while not stop_event.is_set():
             msg = bus.recv(timeout=0.1)
-            if msg is not None:
-                if not png_started and len(msg.data) >= 8 and msg.data[0:8] == b'\x89PNG\r\n\x1a\n':
-                    collected_data = bytearray()
-                    bytes_received = 0
-                    png_started = True
-                    print("PNG Header erkannt - Starte Sammlung")
-
-                if png_started:
-                    collected_data.extend(msg.data)
-                    bytes_received += len(msg.data)
-
-                    if bytes_received % 400 == 0:
-                        print(
-                            f"Empfangen: {bytes_received}/{expected_size} Bytes")
-
-                    if bytes_received >= expected_size:
-                        try:
-                            Image.open(io.BytesIO(collected_data)).verify()
-                            with open(image_path, 'wb') as f:
-                                f.write(collected_data)
-                            print(
-                                f"Bild erfolgreich gespeichert ({bytes_received} Bytes)")
-                            collected_data = bytearray()
-                            bytes_received = 0
-                            png_started = False
-                        except Exception as e:
-                            print(f"Fehler beim Speichern: {e}")
-                            collected_data = bytearray()
-                            bytes_received = 0
-                            png_started = False
+            if msg is None:
+                continue
+            result = assembler.feed(msg.data)
+            if result is None:
+                continue
+            if result.is_err():
+                print(result.unwrap_err())
+                continue
+            try:
+                save_received_image(assembler)
+            except OSError as e:
+                print(f"Fehler beim Speichern: {e}")
 
     except Exception as e:
         print(f"Fehler beim Empfangen: {e}")
+        failed = True
     finally:
-        bus.shutdown()
+        bus_pool.release(port, failed)
 
 
 def main():
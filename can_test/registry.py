@@ -0,0 +1,139 @@
+"""
+Live registry of connected USB-CAN Plus adapters.
+
+A background thread listens for kernel uevents on a netlink socket and
+re-enumerates the FT-X serial ports only when a tty or FT-X USB device comes
+or goes, once per burst of uevents. Scans and the web UI read a snapshot instead of walking the port list
+themselves. Where netlink is unavailable the registry falls back to polling.
+"""
+
+import socket
+import threading
+import time
+from typing import Dict, List, Optional
+
+import serial.tools.list_ports
+
+USB_CAN_VID_PID = "0403:6015"
+NETLINK_KOBJECT_UEVENT = 15
+# Subsystems whose uevents can change the set of USB-CAN ports.
+WATCHED_SUBSYSTEMS = (b"tty", b"usb-serial")
+# USB device events only count for FT-X chips (PRODUCT=vid/pid/bcd in hex).
+USB_CAN_PRODUCT = b"403/6015/"
+# A replug produces a burst of uevents; refresh once it has been quiet
+# for this long, but at the latest after SETTLE_LIMIT.
+DEBOUNCE = 0.2
+SETTLE_LIMIT = 2.0
+POLL_INTERVAL = 2.0
+
+
+def is_relevant_uevent(buf: bytes) -> bool:
+    """True if a uevent can change the set of USB-CAN ports."""
+    fields = dict(item.partition(b"=")[::2] for item in buf.split(b"\0"))
+    subsystem = fields.get(b"SUBSYSTEM")
+    if subsystem in WATCHED_SUBSYSTEMS:
+        return True
+    return (subsystem == b"usb"
+            and fields.get(b"PRODUCT", b"").startswith(USB_CAN_PRODUCT))
+
+
+def enumerate_usb_can_ports():
+    """Enumerate all serial ports with FT-X chip, keyed by device name."""
+    return {item.device: item
+            for item in serial.tools.list_ports.grep(USB_CAN_VID_PID)}
+
+
+class UsbCanRegistry(threading.Thread):
+    """Always-current map of USB-CAN Plus ports."""
+
+    def __init__(self, poll_interval=POLL_INTERVAL):
+        threading.Thread.__init__(self, name="usb-can-registry", daemon=True)
+        self.poll_interval = poll_interval
+        self.generation = 0
+        self._ports: Dict[str, object] = {}
+        self._cond = threading.Condition()
+        self._stop_event = threading.Event()
+
+    def _open_uevent_socket(self) -> Optional[socket.socket]:
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM,
+                                 NETLINK_KOBJECT_UEVENT)
+            sock.bind((0, 1))
+        except (AttributeError, OSError) as err:
+            print(f"Keine Hotplug-Benachrichtigung verfügbar ({err}), "
+                  f"frage alle {self.poll_interval}s ab")
+            return None
+        sock.settimeout(self.poll_interval)
+        return sock
+
+    def refresh(self):
+        """Re-enumerate the ports and notify waiters if the set changed."""
+        ports = enumerate_usb_can_ports()
+        with self._cond:
+            if ports.keys() != self._ports.keys():
+                self.generation += 1
+                self._cond.notify_all()
+            self._ports = ports
+
+    def snapshot(self) -> Dict[str, object]:
+        """Return a copy of the current device name -> port info map."""
+        with self._cond:
+            return dict(self._ports)
+
+    def ports(self) -> List[str]:
+        """Return the sorted device names of all present adapters."""
+        return sorted(self.snapshot())
+
+    def wait_for_change(self, generation, timeout=None) -> int:
+        """Block until the registry moves past `generation`."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.generation != generation,
+                                timeout)
+            return self.generation
+
+    def _settle(self, sock: socket.socket):
+        """Swallow the rest of a uevent burst until it has been quiet."""
+        deadline = time.monotonic() + SETTLE_LIMIT
+        sock.settimeout(DEBOUNCE)
+        try:
+            while time.monotonic() < deadline:
+                sock.recv(8192)
+        except socket.timeout:
+            pass
+        finally:
+            sock.settimeout(self.poll_interval)
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        """Keep the port map current until stopped."""
+        self.refresh()
+        sock = self._open_uevent_socket()
+        try:
+            while not self._stop_event.is_set():
+                if sock is None:
+                    self._stop_event.wait(self.poll_interval)
+                    self.refresh()
+                    continue
+                try:
+                    buf = sock.recv(8192)
+                except socket.timeout:
+                    continue
+                if is_relevant_uevent(buf):
+                    self._settle(sock)
+                    self.refresh()
+        finally:
+            if sock is not None:
+                sock.close()
+
+
+registry = UsbCanRegistry()
+
+
+def start_registry() -> UsbCanRegistry:
+    """Start the shared registry once and wait for its first snapshot."""
+    if not registry.is_alive():
+        registry.refresh()
+        registry.start()
+    return registry
@@ -3,6 +3,8 @@ from fpdf import FPDF
 import os
 from typing_extensions import Dict, Any
 
+from .session import PRUEFMITTEL_SERIALS
+
 
 class TestReport:
     def __init__(self,
@@ -79,7 +81,7 @@ class TestReport:
                           ln=1, align="L")
 
             for device in self.can_report["devices"]:
-                if device.get("serial_number") == "380105787":
+                if device.get("serial_number") in PRUEFMITTEL_SERIALS:
                     self.pdf.cell(
                         w=200, h=10, txt="Gerät: Prüfmittel", ln=1, align="L")
                 else:
@@ -5,32 +5,40 @@
 CAN device tester.
 """
 
-from typing import Dict, Any, List
+from typing import Collection, Dict, Any, List, Optional
 from typing_extensions import TypedDict
 from result import Result, Ok, Err
 
 import argparse
+import asyncio
+import functools
 import os.path
-import queue
-import socket
 import sys
 import textwrap
 import threading
 import time
-import urllib.request
 import xml.etree.ElementTree as ET
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from subprocess import PIPE, Popen
 
 import can
 import serial
 import serial.tools.list_ports
 
-import netifaces
+from .cyclic import HEARTBEAT_PERIOD, counter_messages, start_cyclic, stop_cyclic
+from .device_cache import DeviceCache
+from .registry import enumerate_usb_can_ports, registry
 
 VSCAN_OK = b'\r'
 VSCAN_KO = b'\x07'
 MCAST_GRP = '239.255.255.250'
 MCAST_PORT = 1900
+# Upper bound for the interrogation of a single adapter. process_device()
+# does four serial round-trips with a 1 s read timeout each.
+PROBE_TIMEOUT = 5.0
+PROBE_WORKERS = 16
+# Close channel, serial number, version: sent as one burst by identify().
+IDENTIFY_BURST = b'C\rN\rV\r'
 
 EXAMPLES = ('''\
             Examples
@@ -52,77 +60,33 @@ EXAMPLES = ('''\
             ''')
 
 
-class SsdpListener(threading.Thread):
-    """SSDP listener."""
-
-    def __init__(self, iface, dev_queue):
-        threading.Thread.__init__(self)
-        self.iface = iface
-        self.dev_queue = dev_queue
-        self.sock = socket.socket(socket.AF_INET,
-                                  socket.SOCK_DGRAM,
-                                  socket.IPPROTO_UDP)
-        self.sock.setsockopt(socket.SOL_SOCKET,
-                             socket.SO_REUSEADDR, 1)
-
-    def bind(self):
-        """Bind to specified interface and multicast group."""
-        self.sock.bind(('', MCAST_PORT))
-        mreq = socket.inet_aton(
-            MCAST_GRP) + socket.inet_aton(self.iface)
-        self.sock.setsockopt(socket.IPPROTO_IP,
-                             socket.IP_ADD_MEMBERSHIP, mreq)
-        self.sock.settimeout(10)
-        self.sock.setsockopt(socket.IPPROTO_IP,
-                             socket.IP_MULTICAST_IF,
-                             socket.inet_aton(self.iface))
-
-    def get_xml_tag(self, child, tag):
-        """Get XML tag from device description."""
-        for item in child:
-            if item.tag == tag:
-                return item.text
-
-    def parse_xml(self, text):
-        """Extract freindlyName and check if it is NET-CAN."""
-        dev = dict()
-        root = ET.fromstring(text)
-        for child in root:
-            if child.tag == "{urn:schemas-upnp-org:device-1-0}device":
-                for item in child:
-                    if item.tag == "{urn:schemas-upnp-org:device-1-0}friendlyName":
-                        if "NET-CAN" in item.text:
-                            dev['model'] = self.get_xml_tag(
-                                child, "{urn:schemas-upnp-org:device-1-0}modelName")
-                            dev['fw'] = self.get_xml_tag(
-                                child, "{urn:schemas-upnp-org:device-1-0}firmWareVersionNumber")
-                            dev['hw'] = self.get_xml_tag(
-                                child, "{urn:schemas-upnp-org:device-1-0}hardWareVersionNumber")
-                            dev['sernum'] = self.get_xml_tag(
-                                child, "{urn:schemas-upnp-org:device-1-0}serialNumber")
-                            return dev
-
-        return None
-
-    def run(self):
-        """Watch for SSDP messages."""
-        self.bind()
-        while True:
-            try:
-                buf, addr = self.sock.recvfrom(1024)
-            except socket.timeout:
-                continue
-            if b"devinfo.xml" in buf:
-                location_idx = buf.find(b"LOCATION:")
-                location_end_idx = buf.find(b"xml", location_idx)
-                url = buf[location_idx + 9:location_end_idx + 3]
-                response = urllib.request.urlopen(url.decode("utf-8"))
-                data = response.read()
-                text = data.decode('utf-8')
-                dev = self.parse_xml(text)
-                if dev:
-                    dev['ip'] = addr[0]
-                    self.dev_queue.put(dev)
+def get_xml_tag(child, tag):
+    """Get XML tag from device description."""
+    for item in child:
+        if item.tag == tag:
+            return item.text
+
+
+def parse_device_description(text):
+    """Parse a devinfo.xml, return the device dict if it is a NET-CAN."""
+    dev = dict()
+    root = ET.fromstring(text)
+    for child in root:
+        if child.tag == "{urn:schemas-upnp-org:device-1-0}device":
+            for item in child:
+                if item.tag == "{urn:schemas-upnp-org:device-1-0}friendlyName":
+                    if "NET-CAN" in item.text:
+                        dev['model'] = get_xml_tag(
+                            child, "{urn:schemas-upnp-org:device-1-0}modelName")
+                        dev['fw'] = get_xml_tag(
+                            child, "{urn:schemas-upnp-org:device-1-0}firmWareVersionNumber")
+                        dev['hw'] = get_xml_tag(
+                            child, "{urn:schemas-upnp-org:device-1-0}hardWareVersionNumber")
+                        dev['sernum'] = get_xml_tag(
+                            child, "{urn:schemas-upnp-org:device-1-0}serialNumber")
+                        return dev
+
+    return None
 
 
 class UsbCan(object):
@@ -134,7 +98,8 @@ class UsbCan(object):
 
     def close(self):
         """Close serial port."""
-        self.ser_port.close()
+        if self.ser_port is not None:
+            self.ser_port.close()
 
     def init_serial_port(self):
         """Initialize serial port."""
@@ -172,13 +137,21 @@ class UsbCan(object):
 
         return True
 
-    def lsof(self):
-        """Check if a port is already open."""
-        proc = Popen(["lsof"], stdout=PIPE, stderr=PIPE)
-        output = proc.communicate()[0]
-        for line in output.decode('ascii').split('\n'):
-            if line.find(self.port) != -1:
-                print(f"{self.port} is already open:\n{line}")
+    def lsof(self, owners=None):
+        """
+        Check if a port is already open.
+
+        `owners` is the result of find_port_owners(); pass it in to share
+        one /proc walk between several ports.
+        """
+        if owners is None:
+            owners = find_port_owners([self.port])
+        port_owners = owners.get(self.port, [])
+        for owner in port_owners:
+            print(f"{self.port} is already open by "
+                  f"{owner['command']} (PID {owner['pid']})")
+
+        return port_owners
 
     def get_serial_number(self):
         """Send 'N' to get the serial number."""
@@ -220,12 +193,161 @@ class UsbCan(object):
 
         return buf[1:len(buf) - 1]
 
+    def identify(self, timeout=1.0):
+        """
+        Send C, N and V in one write and parse the replies as they come in.
+
+        Returns a tuple (closed, ser_num, ver) with the same values as
+        close_can_channel(), get_serial_number() and get_version_info(),
+        or None if the adapter did not answer all three in time.
+        """
+        try:
+            self.ser_port.reset_input_buffer()
+            self.ser_port.write(IDENTIFY_BURST)
+        except serial.serialutil.SerialException as err:
+            print(err)
+            return None
+
+        parser = SlcanReplyParser()
+        replies = []
+        deadline = time.monotonic() + timeout
+        while len(replies) < 3 and time.monotonic() < deadline:
+            try:
+                chunk = self.ser_port.read(self.ser_port.in_waiting or 1)
+            except serial.serialutil.SerialException as err:
+                print(err)
+                return None
+            replies.extend(parser.feed(chunk))
+
+        if len(replies) < 3:
+            print(f"Incomplete identify reply: {replies}")
+            return None
+
+        return split_identify_replies(replies)
+
+
+class SlcanReplyParser(object):
+    """
+    Incremental splitter for SLCAN command replies.
+
+    Replies end with CR (success) or are a single BEL (error). Data may
+    arrive in arbitrary pieces; incomplete replies are kept until the
+    next feed(). Received CAN frames (t/T/r/R lines) that were still in
+    flight before the channel closed are dropped.
+    """
+
+    FRAME_PREFIXES = b'tTrR'
+
+    def __init__(self):
+        self._buf = bytearray()
+
+    def feed(self, data):
+        """Add received bytes, return the list of completed replies."""
+        self._buf.extend(data)
+        replies = []
+        start = 0
+        for idx, byte in enumerate(self._buf):
+            if byte == VSCAN_OK[0] or byte == VSCAN_KO[0]:
+                reply = bytes(self._buf[start:idx + 1])
+                start = idx + 1
+                if len(reply) > 1 and reply[0] in self.FRAME_PREFIXES:
+                    continue
+                replies.append(reply)
+        del self._buf[:start]
+        return replies
+
+
+def find_usb_can_ports():
+    """
+    Return the pyserial port infos of all serial ports with FT-X chip.
+
+    Uses the hotplug registry snapshot when the registry is running.
+    """
+    if registry.is_alive():
+        ports = registry.snapshot()
+    else:
+        ports = enumerate_usb_can_ports()
+    return [ports[name] for name in sorted(ports)]
+
+
+def split_identify_replies(replies):
+    """
+    Turn the first three replies to IDENTIFY_BURST into (closed, ser_num,
+    ver), with None for a reply that has the wrong format.
+    """
+    close_reply, ser_reply, ver_reply = replies[:3]
+    closed = close_reply in (VSCAN_OK, VSCAN_KO)
+
+    ser_num = None
+    if ser_reply[:1] == b'N':
+        ser_num = ser_reply[1:len(ser_reply) - 2]
+    else:
+        print(f"Wrong first character: {ser_reply[:1]!r}")
+
+    ver = None
+    if ver_reply[:1] == b'V':
+        ver = ver_reply[1:len(ver_reply) - 1]
+    else:
+        print(f"Wrong first character: {ver_reply[:1]!r}")
+
+    return closed, ser_num, ver
+
+
+class PortOwner(TypedDict):
+    pid: int
+    command: str
+
+
+def find_port_owners(ports: List[str],
+                     exclude_self: bool = True) -> Dict[str, List[PortOwner]]:
+    """
+    Report which processes hold the given ttys open.
+
+    Walks the /proc/<pid>/fd symlinks once for all ports. Processes whose
+    fd table cannot be read (other users without root) are skipped.
+    """
+    targets = {os.path.realpath(port): port for port in ports}
+    owners: Dict[str, List[PortOwner]] = {port: [] for port in ports}
+    own_pid = os.getpid()
+    try:
+        pids = [int(name) for name in os.listdir("/proc") if name.isdigit()]
+    except OSError:
+        return owners
+
+    for pid in pids:
+        if exclude_self and pid == own_pid:
+            continue
+        fd_dir = f"/proc/{pid}/fd"
+        try:
+            fds = os.listdir(fd_dir)
+        except OSError:
+            continue
+        matched = set()
+        for fd in fds:
+            try:
+                link = os.readlink(os.path.join(fd_dir, fd))
+            except OSError:
+                continue
+            port = targets.get(link)
+            if port is not None:
+                matched.add(port)
+        if not matched:
+            continue
+        try:
+            with open(f"/proc/{pid}/comm", "r") as comm:
+                command = comm.read().strip()
+        except OSError:
+            command = "?"
+        for port in matched:
+            owners[port].append({"pid": pid, "command": command})
+
+    return owners
+
 
 def original_find_all_usb_can_devices():
     """Find all serial ports with FT-X chip."""
     port_list = []
-    ports = serial.tools.list_ports.grep("0403:6015")
-    for item in ports:
+    for item in find_usb_can_ports():
         port_list.append(item.device)
 
     return port_list
@@ -233,7 +355,10 @@ def original_find_all_usb_can_devices():
 
 def find_port(port):
     """Find serial port in the list."""
-    ports = serial.tools.list_ports.grep(port)
+    if registry.is_alive():
+        ports = registry.snapshot().values()
+    else:
+        ports = serial.tools.list_ports.grep(port)
     for item in ports:
         if item.device == port:
             print(f"Serial port found: {item}")
@@ -243,24 +368,57 @@ def find_port(port):
                 print(f"Device description is wrong: {item.description}")
 
 
-def check_lsmod(driver):
-    """Invoke lsmod and check for ftdi_sio driver."""
-    proc = Popen(["lsmod"], stdout=PIPE, stderr=PIPE)
+def loaded_modules():
+    """Return the names of all loaded kernel modules."""
+    try:
+        with open("/proc/modules", "r") as mods:
+            return {line.split(' ', 1)[0] for line in mods if line.strip()}
+    except OSError:
+        pass
+
+    try:
+        proc = Popen(["lsmod"], stdout=PIPE, stderr=PIPE)
+    except OSError:
+        return set()
     output = proc.communicate()[0]
-    for line in output.decode('ascii').split('\n'):
-        if driver in line:
-            return True
+    return {line.split(' ', 1)[0]
+            for line in output.decode('ascii').split('\n')[1:] if line}
 
-    return False
 
+def check_lsmod(driver):
+    """Check whether a driver is loaded."""
+    return driver.replace('-', '_') in loaded_modules()
 
-def find_file(path, drv_file_name):
-    """Find file."""
-    for root, dirs, files in os.walk(path):
-        if drv_file_name in files:
-            return os.path.join(root, drv_file_name)
 
-    return None
+def _module_name(path):
+    """kernel/drivers/net/can/slcan/slcan.ko.zst -> slcan"""
+    name = os.path.basename(path.strip())
+    return name.split('.ko', 1)[0].replace('-', '_')
+
+
+@functools.lru_cache(maxsize=None)
+def module_index(kernel_ver):
+    """
+    Map module names to ('module' | 'builtin', path) for a kernel version.
+
+    Parsed once from modules.dep and modules.builtin, which list every
+    module shipped with the kernel, so no directory tree has to be walked.
+    """
+    mod_dir = f"/lib/modules/{kernel_ver}"
+    index = {}
+    for file_name, state in (("modules.builtin", 'builtin'),
+                             ("modules.dep", 'module')):
+        try:
+            with open(os.path.join(mod_dir, file_name), "r") as mods:
+                for line in mods:
+                    path = line.split(':', 1)[0].strip()
+                    if path:
+                        index[_module_name(path)] = (
+                            state, os.path.join(mod_dir, path))
+        except OSError:
+            pass
+
+    return index
 
 
 def find_driver(kernel_ver, drv_name):
@@ -270,20 +428,13 @@ def find_driver(kernel_ver, drv_name):
     if check_lsmod(drv_name):
         drv_info['loaded'] = True
 
-    # check if the driver is in rootfs
-    drv_path = find_file(f"/lib/modules/{kernel_ver}/kernel/drivers",
-                         f"{drv_name}.ko")
-    if drv_path:
-        drv_info['state'] = 'module'
-        drv_info['path'] = drv_path
+    entry = module_index(kernel_ver).get(drv_name.replace('-', '_'))
+    if entry is None:
         return drv_info
 
-    # check if the driver is builtin
-    with open(f"/lib/modules/{kernel_ver}/modules.builtin", "r") as mods:
-        for line in mods:
-            if f"{drv_name}.ko" in line:
-                drv_info['state'] = 'builtin'
-                break
+    drv_info['state'] = entry[0]
+    if entry[0] == 'module':
+        drv_info['path'] = entry[1]
 
     return drv_info
 
@@ -302,31 +453,14 @@ def fix_port_type(port):
 
 def ssdp_discover():
     """Discover NetCAN Plus devices."""
-    dev_queue = queue.Queue()
-    ssdp_listeners = []
-    netcans = []
-    ifs = netifaces.interfaces()
-    for item in ifs:
-        addrs = netifaces.ifaddresses(item)
-        try:
-            ssdp_item = SsdpListener(addrs[netifaces.AF_INET][0]["addr"],
-                                     dev_queue)
-            ssdp_item.start()
-            ssdp_listeners.append(ssdp_item)
-        except KeyError:
-            pass
+    from .netcan import discover_netcans
 
-    print(f"{len(ssdp_listeners)} SSDP threads started.")
-    t_end = time.time() + 10
-    while time.time() < t_end:
-        try:
-            msg = dev_queue.get(block=True, timeout=0.1)
-        except queue.Empty:
-            continue
-        if msg not in netcans:
-            netcans.append(msg)
-            print(f"NetCAN {msg['model']}({msg['ip']}) -> "
-                  f"(SN: {msg['sernum']}, FW: {msg['fw']}, HW: {msg['hw']})")
+    netcans = asyncio.run(discover_netcans())
+    for msg in netcans:
+        print(f"NetCAN {msg['model']}({msg['ip']}) -> "
+              f"(SN: {msg['sernum']}, FW: {msg['fw']}, HW: {msg['hw']})")
+
+    return netcans
 
 
 def show_driver_info(drv_name, drv_info):
@@ -346,10 +480,7 @@ def show_driver_info(drv_name, drv_info):
 
 def get_system_info():
     """Get system information."""
-    # get kernel version
-    proc = Popen(["uname", "-r"], stdout=PIPE, stderr=PIPE)
-    output = proc.communicate()[0]
-    kernel_ver = output.decode('ascii').split('\n')[0]
+    kernel_ver = os.uname().release
 
     print(f"Kernel: {kernel_ver}")
 
@@ -405,21 +536,25 @@ def send_can_frames(port, bitrate, mode):
         msg = can.Message(arbitration_id=0x100,
                           is_extended_id=False,
                           data=[0x00, 0x01, 0x02, 0x03])
-        while True:
-            bus.send(msg)
-            time.sleep(0.5)
+        run_cyclic(bus, [(msg, HEARTBEAT_PERIOD)])
     elif mode == 'inc':
         print("Sending a CAN frame with incrementing last byte every 500ms")
         msg = can.Message(arbitration_id=0x100,
                           is_extended_id=False,
                           data=[0x00, 0x01, 0x02, 0x03])
-        while True:
-            if msg.data[3] == 0xff:
-                msg.data[3] = 0
-            else:
-                msg.data[3] = msg.data[3] + 1
-            bus.send(msg)
-            time.sleep(0.5)
+        run_cyclic(bus, [(counter_messages(msg), HEARTBEAT_PERIOD)])
+
+
+def run_cyclic(bus, schedule):
+    """Send the schedule periodically until interrupted."""
+    tasks = start_cyclic(bus, schedule)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_cyclic(tasks)
+        bus.shutdown()
 
 
 class FoundDeviceError(TypedDict):
@@ -428,45 +563,47 @@ class FoundDeviceError(TypedDict):
     error: str
 
 
-def initialize() -> Result[Dict[str, Any], str]:
-    """Main routine."""
-    port_list_result: Result[List["str"], str] = find_all_usb_can_devices()
-    print(port_list_result)
-    if isinstance(port_list_result, Err):
-        return Err("Es wurden keine USB-CAN Geräte gefunden.")
+device_cache = DeviceCache()
+
 
+def initialize(use_cache: bool = True,
+               hosts: Optional[List[str]] = None) -> Result[Dict[str, Any], str]:
+    """
+    Main routine.
 
-    port_list = port_list_result
-    if not port_list:
+    `hosts` are NetCAN Plus hosts, host:port pairs or CIDR ranges that are
+    probed over TCP in addition to the local USB ports.
+    """
+    port_list_result: Result[List["str"], str] = find_all_usb_can_devices()
+    print(port_list_result)
+    if isinstance(port_list_result, Err) and not hosts:
         if sys.platform.startswith('linux'):
             get_system_info()
         return Err("Es wurden keine USB-CAN Geräte gefunden.")
 
+    ports: List[str] = port_list_result.unwrap_or([])
     devices_info: List[Result[FoundDevice, FoundDeviceError]] = []
-    for device in port_list.unwrap():
-        device_result: Result[FoundDevice, str] = process_device(device)
-        if isinstance(device_result, Ok):
-            found_device: FoundDevice = device_result.unwrap()
-            devices_info.append(Ok(found_device))
-        elif device_result.is_err():
-            error_message: str = device_result.unwrap_err()
-            device_error: FoundDeviceError = {
-                "port": device,
-                "status": "error",
-                "error": error_message
-            }
-            devices_info.append(Err(device_error))
-        # match device_result:
-        #     case isinstance(devices_info, Ok):
-        #         devices_info[device] = info
-            # case Err(error):
-            #     devices_info[str(item)] = {
-            #         'port': str(item),
-            #         'status': 'error',
-            #         'error': str(error)
-            #     }
-
-    return Ok({"status": "success", "devices": devices_info})
+    # Busy ports would only time out; report their owners instead.
+    owners = find_port_owners(ports)
+    free_ports = [port for port in ports if not owners[port]]
+    probe_results = dict(zip(free_ports,
+                             identify_ports(free_ports) if use_cache
+                             else probe_devices(free_ports)))
+    for device in ports:
+        if device in probe_results:
+            device_result = probe_results[device]
+        else:
+            device_result = busy_error(owners[device])
+        devices_info.append(device_info(device, device_result))
+
+    if hosts:
+        from .netcan import probe_netcans
+
+        for url, device_result in asyncio.run(probe_netcans(hosts)):
+            ports.append(url)
+            devices_info.append(device_info(url, device_result))
+
+    return Ok({"status": "success", "devices": devices_info, "ports": ports})
 
 
 class FoundDevice(TypedDict):
@@ -480,11 +617,150 @@ class FoundDevice(TypedDict):
     status: str
 
 
-def process_device(device_port: str) -> Result[FoundDevice, str]:
-    """Process a single USB-CAN device."""
+async def scan_devices(use_cache: bool = True,
+                       hosts: Optional[List[str]] = None,
+                       timeout: float = PROBE_TIMEOUT,
+                       in_use: Collection[str] = ()):
+    """
+    Async counterpart of initialize() that streams its results.
+
+    All blocking serial work runs in worker threads, so the event loop
+    stays free. Yields (index, port, device info) as soon as each port is
+    done; `index` is the position initialize() would report it at.
+    Ports in `in_use` are open elsewhere in this process and are answered
+    from the device cache only, never probed.
+    """
+    port_list_result = await asyncio.to_thread(find_all_usb_can_devices)
+    ports: List[str] = port_list_result.unwrap_or([])
+    owners = await asyncio.to_thread(find_port_owners, ports)
+    probe = identify_port if use_cache else process_device
+
+    async def probe_usb(idx, port):
+        if owners[port]:
+            return idx, port, busy_error(owners[port])
+        if port in in_use:
+            cached = await asyncio.to_thread(cached_device, port)
+            if cached is None:
+                cached = Err("Port is in use by another test")
+            return idx, port, cached
+        try:
+            device_result = await asyncio.wait_for(
+                asyncio.to_thread(probe, port), timeout)
+        except asyncio.TimeoutError:
+            device_result = Err(f"Timed out after {timeout:.0f}s")
+        return idx, port, device_result
+
+    tasks = [probe_usb(idx, port) for idx, port in enumerate(ports)]
+    if hosts:
+        from .netcan import expand_targets, limited_probe
+
+        # A large subnet must not open all connections at once.
+        probe_netcan = limited_probe()
+
+        async def probe_net(idx, host, host_port):
+            device_result = await probe_netcan(host, host_port)
+            return idx, f"socket://{host}:{host_port}", device_result
+
+        tasks.extend(probe_net(len(ports) + idx, host, host_port)
+                     for idx, (host, host_port)
+                     in enumerate(expand_targets(hosts)))
+
+    for next_done in asyncio.as_completed(tasks):
+        idx, port, device_result = await next_done
+        yield idx, port, device_info(port, device_result)
+
+
+async def initialize_async(use_cache: bool = True,
+                           hosts: Optional[List[str]] = None,
+                           on_result=None,
+                           in_use: Collection[str] = ()) -> Result[Dict[str, Any], str]:
+    """
+    Run scan_devices() to completion and return the same structure as
+    initialize(). `on_result(port, device_info)` is called per device as
+    it finishes.
+    """
+    results = {}
+    async for idx, port, info in scan_devices(use_cache, hosts,
+                                              in_use=in_use):
+        results[idx] = (port, info)
+        if on_result is not None:
+            on_result(port, info)
+
+    if not results:
+        if sys.platform.startswith('linux'):
+            await asyncio.to_thread(get_system_info)
+        return Err("Es wurden keine USB-CAN Geräte gefunden.")
+
+    ordered = [results[idx] for idx in sorted(results)]
+    return Ok({"status": "success",
+               "devices": [info for _, info in ordered],
+               "ports": [port for port, _ in ordered]})
+
+
+def busy_error(port_owners: List[PortOwner]) -> Result[FoundDevice, str]:
+    """Error for a port that other processes hold open."""
+    return Err("Port is already open by " + ", ".join(
+        f"{owner['command']} (PID {owner['pid']})" for owner in port_owners))
+
+
+def device_info(port: str, device_result: Result[FoundDevice, str]
+                ) -> Result[FoundDevice, FoundDeviceError]:
+    """Attach the port to a failed probe result."""
+    if isinstance(device_result, Ok):
+        return device_result
+
+    device_error: FoundDeviceError = {
+        "port": port,
+        "status": "error",
+        "error": device_result.unwrap_err()
+    }
+    return Err(device_error)
+
+
+def process_device(device_port: str,
+                   pipelined: bool = True) -> Result[FoundDevice, str]:
+    """
+    Process a single USB-CAN device.
+
+    With `pipelined` the C/N/V commands go out in a single burst
+    (UsbCan.identify()) instead of three separate round-trips.
+    """
 
     usbcan = UsbCan(device_port)
+    try:
+        if pipelined:
+            return _identify(usbcan)
+        return _interrogate(usbcan)
+    finally:
+        usbcan.close()
+
+
+def _identify(usbcan: UsbCan) -> Result[FoundDevice, str]:
+    """Identify an unopened UsbCan with one pipelined exchange."""
+    if not usbcan.init_serial_port():
+        return Err("Failed to open serial port")
 
+    return identified_device(usbcan.identify())
+
+
+def identified_device(replies) -> Result[FoundDevice, str]:
+    """Build the FoundDevice from the result of split_identify_replies()."""
+    if replies is None:
+        return Err("Failed to identify the device")
+
+    closed, ser_num, ver = replies
+    if not closed:
+        return Err("Failed to close the CAN channel")
+    if not ser_num:
+        return Err("Failed to get the serial number")
+    if not ver:
+        return Err("Failed to get the firmware version")
+
+    return _found_device(ser_num, ver)
+
+
+def _interrogate(usbcan: UsbCan) -> Result[FoundDevice, str]:
+    """Run the ASCII interrogation on an unopened UsbCan."""
     init_result = usbcan.init_serial_port()
     if not init_result:
         return Err("Failed to open serial port")
@@ -501,25 +777,154 @@ def process_device(device_port: str) -> Result[FoundDevice, str]:
     if not ver:
         return Err("Failed to get the firmware version")
 
+    return _found_device(ser_num, ver)
+
+
+def _found_device(ser_num: bytes, ver: bytes) -> Result[FoundDevice, str]:
+    """Build the FoundDevice record from raw N and V replies."""
     try:
         ver_major = int(ver[2:3], 16)
         ver_minor = int(ver[3:], 16)
         hw_major = int(ver[:1], 16)
         hw_minor = int(ver[1:2], 16)
-    except (ValueError, IndexError):
+        serial_number = ser_num.decode('ascii')
+    except (ValueError, IndexError, UnicodeDecodeError):
         return Err("Failed to parse version information")
 
     found_device: FoundDevice = {
-        'serial_number': ser_num.decode('ascii'),
+        'serial_number': serial_number,
         'firmware': f"{ver_major}:{ver_minor}",
         'hardware': f"{hw_major}:{hw_minor}",
         'status': 'success'
     }
 
-    usbcan.close()
     return Ok(found_device)
 
 
+def probe_devices(ports: List[str],
+                  timeout: float = PROBE_TIMEOUT) -> List[Result[FoundDevice, str]]:
+    """
+    Interrogate all ports concurrently.
+
+    Every port gets `timeout` seconds from the moment a worker starts its
+    probe; a port that misses this deadline is reported as an error
+    instead of holding up the scan. Ports still queued behind hung probes
+    when the whole scan has used `timeout` per round of workers are
+    reported without being probed. Results are returned in the order of
+    `ports`.
+    """
+    if not ports:
+        return []
+
+    workers = min(PROBE_WORKERS, len(ports))
+    rounds = -(-len(ports) // workers)
+    started: Dict[int, float] = {}
+
+    def probe(idx: int, port: str) -> Result[FoundDevice, str]:
+        started[idx] = time.monotonic()
+        return process_device(port)
+
+    executor = ThreadPoolExecutor(max_workers=workers,
+                                  thread_name_prefix="can-probe")
+    try:
+        scan_deadline = time.monotonic() + timeout * rounds
+        futures = [executor.submit(probe, idx, port)
+                   for idx, port in enumerate(ports)]
+        pending = set(range(len(ports)))
+        expired = set()
+        while pending:
+            now = time.monotonic()
+            for idx in list(pending):
+                if futures[idx].done():
+                    pending.discard(idx)
+                elif idx in started and now >= started[idx] + timeout:
+                    pending.discard(idx)
+                    expired.add(idx)
+            if not pending or now >= scan_deadline:
+                break
+            next_deadline = min([started[idx] + timeout
+                                 for idx in pending if idx in started]
+                                + [scan_deadline])
+            # Also wait on expired probes: when one ends it frees a worker,
+            # and the probe that worker starts next needs its own deadline.
+            wait([future for future in futures if not future.done()],
+                 timeout=next_deadline - now, return_when=FIRST_COMPLETED)
+
+        results: List[Result[FoundDevice, str]] = []
+        for idx, future in enumerate(futures):
+            if idx in expired:
+                results.append(Err(f"Timed out after {timeout:.0f}s"))
+            elif not future.done():
+                future.cancel()
+                results.append(Err("Not probed, all probe workers were "
+                                   "busy with unresponsive ports"))
+            else:
+                try:
+                    results.append(future.result())
+                except Exception as err:
+                    results.append(Err(f"Probe failed: {err}"))
+        return results
+    finally:
+        # A hung port must not block the scan; its worker finishes in the
+        # background once the serial timeout fires.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _port_info(port: str):
+    """The pyserial port info of one USB-CAN port, None if it is absent."""
+    if registry.is_alive():
+        return registry.snapshot().get(port)
+    return enumerate_usb_can_ports().get(port)
+
+
+def cached_device(port: str) -> Optional[Result[FoundDevice, str]]:
+    """The device cache entry for a port, None if it has to be probed."""
+    port_info = _port_info(port)
+    cached = device_cache.get(port_info) if port_info is not None else None
+    return Ok(cached) if cached is not None else None
+
+
+def identify_port(port: str) -> Result[FoundDevice, str]:
+    """
+    Like process_device(), but answer a known adapter from the device
+    cache and only probe it if it is new or was replugged.
+    """
+    cached = cached_device(port)
+    if cached is not None:
+        return cached
+
+    device_result = process_device(port)
+    port_info = _port_info(port)
+    if device_result.is_ok() and port_info is not None:
+        device_cache.put(port_info, device_result.unwrap())
+    return device_result
+
+
+def identify_ports(ports: List[str]) -> List[Result[FoundDevice, str]]:
+    """
+    Like probe_devices(), but answer known adapters from the device cache
+    and only probe ports that are new or were replugged.
+    """
+    port_infos = {item.device: item for item in find_usb_can_ports()}
+    results: List[Optional[Result[FoundDevice, str]]] = [None] * len(ports)
+    misses: List[int] = []
+    for idx, port in enumerate(ports):
+        cached = (device_cache.get(port_infos[port])
+                  if port in port_infos else None)
+        if cached is not None:
+            results[idx] = Ok(cached)
+        else:
+            misses.append(idx)
+
+    probed = probe_devices([ports[idx] for idx in misses])
+    for idx, device_result in zip(misses, probed):
+        results[idx] = device_result
+        if device_result.is_ok() and ports[idx] in port_infos:
+            device_cache.put(port_infos[ports[idx]], device_result.unwrap())
+
+    return results
+
+
 def find_all_usb_can_devices() -> Result[List[str], str]:
     """Find all USB-CAN devices and return as Result."""
     try:
@@ -587,11 +992,13 @@ def main():
 
     port_list = []
     if args.port == 'all':
-        port_list = find_all_usb_can_devices()
-        if not port_list:
-            print("No USB-CAN devices found")
+        devices_result = find_all_usb_can_devices()
+        if devices_result.is_err():
+            print(devices_result.unwrap_err())
             if sys.platform.startswith('linux'):
                 get_system_info()
+        else:
+            port_list = devices_result.unwrap()
     else:
         port_list.append(fix_port_type(args.port))
 
@@ -610,11 +1017,15 @@ def main():
             send_can_frames(fix_port_type(args.port), args.bitrate, args.tx)
             sys.exit(0)
 
+    owners = {}
+    if sys.platform.startswith('linux'):
+        owners = find_port_owners(port_list)
+
     for item in port_list:
         usbcan = UsbCan(item)
         if sys.platform.startswith('linux'):
             find_port(usbcan.port)
-            usbcan.lsof()
+            usbcan.lsof(owners)
 
         if not usbcan.init_serial_port():
             print("Failed to open serial port")
@@ -0,0 +1,184 @@
+"""
+Scheduler for test jobs (scan, videosignal tests, VGA check, report).
+
+Jobs name the ports (or other exclusive resources such as the display)
+they use. A job only starts when all of them are free and one of the
+bounded worker slots is available; among waiting jobs the one with the
+highest priority runs first, jobs of equal priority in submission order.
+A waiting job is never overtaken on its resources by a job of lower
+priority, so a long scan cannot slip in ahead of a queued video test.
+"""
+
+import asyncio
+import itertools
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional
+
+from typing_extensions import TypedDict
+
+# Niedrigere Zahl = höhere Priorität; kurze Bedienschritte zuerst
+PRIORITIES = {"report": 0, "vga": 1, "video": 2, "scan": 3}
+TIMEOUTS = {"scan": 60.0, "video": 30.0, "vga": 15.0, "report": 30.0}
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+# Anzahl der Jobs je Art, über die die Latenzen gemittelt werden
+LATENCY_WINDOW = 100
+
+
+class JobTimeout(asyncio.TimeoutError):
+    """A job did not finish within its timeout and was cancelled."""
+
+
+class LatencyStats(TypedDict):
+    submitted: int
+    completed: int
+    failed: int
+    timed_out: int
+    wait_ms_avg: float
+    wait_ms_max: float
+    run_ms_avg: float
+    run_ms_max: float
+
+
+class _Job(object):
+    def __init__(self, seq: int, kind: str, factory: Callable[[], Awaitable[Any]],
+                 resources: Iterable[str], priority: int, timeout: float):
+        self.seq = seq
+        self.kind = kind
+        self.factory = factory
+        self.resources = frozenset(resources)
+        self.priority = priority
+        self.timeout = timeout
+        self.future = asyncio.get_running_loop().create_future()
+        self.submitted = time.perf_counter()
+
+    def sort_key(self):
+        return self.priority, self.seq
+
+
+class _KindStats(object):
+    def __init__(self):
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.wait_ms: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.run_ms: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def summary(self) -> LatencyStats:
+        def avg(values):
+            return round(sum(values) / len(values), 1) if values else 0.0
+
+        return {
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timed_out": self.timed_out,
+            "wait_ms_avg": avg(self.wait_ms),
+            "wait_ms_max": round(max(self.wait_ms, default=0.0), 1),
+            "run_ms_avg": avg(self.run_ms),
+            "run_ms_max": round(max(self.run_ms, default=0.0), 1),
+        }
+
+
+class JobScheduler(object):
+    """Runs test jobs on a bounded number of workers, one job per port."""
+
+    def __init__(self, workers: int = DEFAULT_WORKERS):
+        self.workers = workers
+        self._pending: List[_Job] = []
+        self._busy: Dict[str, str] = {}
+        self._running = 0
+        self._seq = itertools.count()
+        self._stats: Dict[str, _KindStats] = {}
+
+    async def run(self, kind: str, factory: Callable[[], Awaitable[Any]],
+                  resources: Iterable[str] = (),
+                  priority: Optional[int] = None,
+                  timeout: Optional[float] = None) -> Any:
+        """
+        Queue a job and return what `factory()` returns once it has run.
+
+        `priority` and `timeout` default to the PRIORITIES and TIMEOUTS
+        entry of `kind`. Raises JobTimeout if the job runs longer than
+        `timeout` seconds; exceptions of the job are passed on.
+        """
+        job = _Job(next(self._seq), kind, factory, resources,
+                   PRIORITIES.get(kind, len(PRIORITIES)) if priority is None else priority,
+                   TIMEOUTS.get(kind) if timeout is None else timeout)
+        self._stats.setdefault(kind, _KindStats()).submitted += 1
+        self._pending.append(job)
+        self._pending.sort(key=_Job.sort_key)
+        self._dispatch()
+        try:
+            return await job.future
+        except asyncio.CancelledError:
+            # Der Aufrufer wartet nicht mehr, ein wartender Job entfällt
+            if job in self._pending:
+                self._pending.remove(job)
+            raise
+
+    def _dispatch(self):
+        blocked = set()
+        for job in list(self._pending):
+            if self._running >= self.workers:
+                break
+            if job.resources & blocked or any(resource in self._busy
+                                              for resource in job.resources):
+                blocked |= job.resources
+                continue
+            self._pending.remove(job)
+            self._running += 1
+            for resource in job.resources:
+                self._busy[resource] = job.kind
+            asyncio.ensure_future(self._execute(job))
+
+    async def _execute(self, job: _Job):
+        stats = self._stats[job.kind]
+        started = time.perf_counter()
+        stats.wait_ms.append((started - job.submitted) * 1000)
+        try:
+            result = await asyncio.wait_for(job.factory(), job.timeout)
+        except asyncio.TimeoutError:
+            stats.timed_out += 1
+            if not job.future.done():
+                job.future.set_exception(JobTimeout(
+                    f"Zeitüberschreitung: {job.kind} wurde nach "
+                    f"{job.timeout:g}s abgebrochen."))
+        except asyncio.CancelledError:
+            job.future.cancel()
+            raise
+        except Exception as e:
+            stats.failed += 1
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            stats.completed += 1
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            stats.run_ms.append((time.perf_counter() - started) * 1000)
+            self._running -= 1
+            for resource in job.resources:
+                self._busy.pop(resource, None)
+            self._dispatch()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth, busy ports and per-kind latencies."""
+        depth: Dict[str, int] = {}
+        for job in self._pending:
+            for resource in job.resources:
+                depth[resource] = depth.get(resource, 0) + 1
+        return {
+            "workers": self.workers,
+            "running": self._running,
+            "queued": len(self._pending),
+            "queue_depth": depth,
+            "busy": dict(self._busy),
+            "jobs": {kind: stats.summary()
+                     for kind, stats in self._stats.items()},
+        }
+
+
+scheduler = JobScheduler()
@@ -1,98 +1,209 @@
 from threading import Event
 import can
-import serial
 import sys
 import threading
-import time
-from PIL import Image
 import io
+import os
 from pathlib import Path
 
-BASE_DIR = Path(__file__).resolve().parent.parent
-
-
-def send_can_frames(port, bitrate, stop_event):
-    """Send CAN frames."""
-    try:
-        bus = can.interface.Bus(
-            interface='slcan',
-            channel=f"{port}@3000000",
-            rtscts=True,
-            bitrate=bitrate
-        )
-    except serial.serialutil.SerialException as err:
-        print(f"Fehler beim Öffnen des CAN-Bus: {err}")
-        return
+from .buspool import BUS_ERRORS, bus_pool
+from .cyclic import HEARTBEAT_PERIOD, start_cyclic, stop_cyclic
+from .timing import (TARGET_BUS_LOAD, DeadlineScheduler, TokenBucketPacer,
+                     message_bits)
 
-    print(f"Sende auf {port}")
+BASE_DIR = Path(__file__).resolve().parent.parent
+IMAGE_PATH = BASE_DIR / "can_test/static/colorbars.png"
+IMAGE_ARBITRATION_ID = 0x100
+# Gegenrichtung im Vollduplex-Test
+REVERSE_ARBITRATION_ID = 0x101
+FRAME_SIZE = 8
+# Frames pro Schreibzugriff bei Backends mit send_burst() (z. B. fastslcan)
+BURST_FRAMES = 8
 
-    msg = can.Message(
-        arbitration_id=0x100,
-        is_extended_id=False,
-        data=[0x00, 0x01, 0x02, 0x03]
-    )
+# (Pfad, mtime, Größe) -> PNG-Bytes bzw. fertige Frames
+_payload_cache = {}
+_frame_cache = {}
 
-    while not stop_event.is_set():
-        try:
-            bus.send(msg)
-            time.sleep(0.5)
-        except can.CanError:
-            pass
 
-    print("Beende CAN-Bus...")
-    bus.shutdown()
+def _file_key(image_path):
+    stat = os.stat(image_path)
+    return (str(image_path), stat.st_mtime_ns, stat.st_size)
 
 
-def send_image_over_can(port, bitrate, stop_event):
-    try:
-        bus = can.interface.Bus(
-            interface='slcan',
-            channel=f"{port}@3000000",
-            rtscts=True,
-            bitrate=bitrate
-        )
+def load_image_payload(image_path=IMAGE_PATH):
+    """
+    PNG-kodierte Bilddaten, einmal pro Dateistand erzeugt.
 
-        # Konstruiere den korrekten Pfad für das Bild
-        image_path = BASE_DIR / "can_test/static/colorbars.png"
+    Das Bild wird nur neu kodiert, wenn sich Änderungszeit oder Größe der
+    Datei geändert haben.
+    """
+    key = _file_key(image_path)
+    payload = _payload_cache.get(key)
+    if payload is None:
+        from PIL import Image
 
         with Image.open(image_path) as img:
             img_byte_array = io.BytesIO()
             img.save(img_byte_array, format='PNG')
-            image_bytes = img_byte_array.getvalue()
+            payload = img_byte_array.getvalue()
+        _payload_cache.clear()
+        _payload_cache[key] = payload
+    return payload
+
+
+def build_image_frames(image_path=IMAGE_PATH,
+                       arbitration_id=IMAGE_ARBITRATION_ID):
+    """
+    Fertige, wiederverwendbare CAN-Frames für ein Bild.
+
+    Der letzte Frame wird mit Nullen auf 8 Bytes aufgefüllt.
+    """
+    file_key = _file_key(image_path)
+    key = file_key + (arbitration_id,)
+    cached = _frame_cache.get(key)
+    if cached is None:
+        payload = load_image_payload(image_path)
+        padded = payload + bytes(-len(payload) % FRAME_SIZE)
+        frames = [
+            can.Message(
+                arbitration_id=arbitration_id,
+                is_extended_id=False,
+                data=padded[i:i + FRAME_SIZE]
+            )
+            for i in range(0, len(padded), FRAME_SIZE)
+        ]
+        # Frames veralteter Dateistände verwerfen
+        for stale in [k for k in _frame_cache if k[:3] != file_key]:
+            del _frame_cache[stale]
+        cached = _frame_cache[key] = (frames, len(payload))
+    return cached
+
+
+def send_can_frames(port, bitrate, stop_event, schedule=None):
+    """
+    Send CAN frames cyclically until stop_event is set.
+
+    `schedule` is a list of (message(s), period) entries for start_cyclic();
+    by default a single heartbeat frame every 500 ms is sent. The bus is
+    leased from the bus pool.
+    """
+    try:
+        bus = bus_pool.acquire(port, bitrate)
+    except BUS_ERRORS as err:
+        print(f"Fehler beim Öffnen des CAN-Bus: {err}")
+        return
+
+    print(f"Sende auf {port}")
 
-        chunks = [image_bytes[i:i+8] for i in range(0, len(image_bytes), 8)]
-        total_frames = len(chunks)
-        print(f"Gesamtgröße: {len(image_bytes)} Bytes")
-        print(f"Starte Übertragung von {total_frames} Frames")
+    if schedule is None:
+        msg = can.Message(
+            arbitration_id=0x100,
+            is_extended_id=False,
+            data=[0x00, 0x01, 0x02, 0x03]
+        )
+        schedule = [(msg, HEARTBEAT_PERIOD)]
+
+    failed = False
+    try:
+        tasks = start_cyclic(bus, schedule)
+        stop_event.wait()
+        stop_cyclic(tasks)
+    except can.CanError as err:
+        print(f"Fehler beim zyklischen Senden: {err}")
+        failed = True
+    finally:
+        bus_pool.release(port, failed)
+
+
+def send_image(bus, bitrate, stop_event, bus_load=TARGET_BUS_LOAD, cpu=None,
+               arbitration_id=IMAGE_ARBITRATION_ID):
+    """
+    Sendet das Testbild einmal über einen geöffneten Bus.
+
+    Die Frames werden so getaktet, dass sie `bus_load` der Bitrate belegen,
+    und gegen absolute Deadlines gesendet. Mit `cpu` wird der Sendethread
+    auf diese CPU gebunden. Das Ergebnis enthält ein Jitter-Histogramm.
+    Unterstützt der Bus send_burst(), gehen jeweils BURST_FRAMES Frames in
+    einem Schreibzugriff raus. Liefert None, wenn das Senden fehlschlägt;
+    ein Fehler beim Schreiben auf den Bus (BUS_ERRORS) wird ausgelöst,
+    damit nur dann der Bus verworfen wird.
+    """
+    bus_error = None
+    try:
+        frames, payload_size = build_image_frames(arbitration_id=arbitration_id)
+        total_frames = len(frames)
+
+        print(f"Gesamtgröße: {payload_size} Bytes")
+        print(f"Starte Übertragung von {total_frames} Frames "
+              f"auf ID 0x{arbitration_id:03X}")
 
+        pacer = TokenBucketPacer(bitrate, bus_load)
+        scheduler = DeadlineScheduler(cpu=cpu)
+        send_burst = getattr(bus, "send_burst", None)
+        burst = BURST_FRAMES if send_burst is not None else 1
         frames_sent = 0
-        start_time = time.time()
-
-        while not stop_event.is_set():
-            for i, chunk in enumerate(chunks):
-                if len(chunk) < 8:
-                    chunk = chunk + bytes(8 - len(chunk))
-
-                msg = can.Message(
-                    arbitration_id=0x100,
-                    is_extended_id=False,
-                    data=chunk
-                )
-                bus.send(msg)
-                frames_sent += 1
-
-                if frames_sent % 50 == 0:
-                    elapsed = time.time() - start_time
-                    print(
-                        f"Gesendet: {frames_sent}/{total_frames} Frames ({(frames_sent/total_frames*100):.1f}%) in {elapsed:.1f}s")
 
-                time.sleep(0.001)  # 1ms Pause zwischen Frames
+        with scheduler.pinned():
+            for start in range(0, total_frames, burst):
+                if stop_event.is_set():
+                    break
+                batch = frames[start:start + burst]
+                scheduler.wait_until(pacer.next_send_time(
+                    sum(message_bits(msg) for msg in batch), len(batch)))
+                try:
+                    if send_burst is not None:
+                        send_burst(batch)
+                    else:
+                        bus.send(batch[0])
+                except BUS_ERRORS as e:
+                    bus_error = e
+                    break
+                frames_sent += len(batch)
+
+                if frames_sent % 50 < len(batch):
+                    print(
+                        f"Gesendet: {frames_sent}/{total_frames} Frames ({(frames_sent/total_frames*100):.1f}%)")
 
+        if bus_error is None:
+            jitter = scheduler.jitter()
+            stats = pacer.stats(payload_size, jitter)
             print(
-                f"Übertragung abgeschlossen nach {time.time() - start_time:.1f} Sekunden")
-            break
+                f"Übertragung abgeschlossen nach {stats['duration_s']:.2f} Sekunden "
+                f"({stats['frames_per_second']:.0f} Frames/s, "
+                f"Buslast {stats['bus_load'] * 100:.0f}%, "
+                f"Jitter max {jitter['max_us']:.0f}µs)")
+            return stats
 
     except Exception as e:
         print(f"Fehler beim Senden: {e}")
+        return None
+
+    print(f"Fehler beim Senden: {bus_error}")
+    raise bus_error
+
+
+def send_image_over_can(port, bitrate, stop_event, bus_load=TARGET_BUS_LOAD,
+                        cpu=None, interface='slcan',
+                        arbitration_id=IMAGE_ARBITRATION_ID):
+    """
+    Leiht den Bus an `port` aus dem Pool und sendet das Testbild mit
+    send_image().
+
+    Gibt die erreichte Rate zurück, None bei einem Fehler. Nur nach einem
+    Fehler des Busses selbst wird er beim nächsten Mal neu geöffnet.
+    """
+    try:
+        bus = bus_pool.acquire(port, bitrate, interface)
+    except BUS_ERRORS as e:
+        print(f"Fehler beim Senden: {e}")
+        return None
+
+    failed = False
+    try:
+        return send_image(bus, bitrate, stop_event, bus_load, cpu,
+                          arbitration_id)
+    except BUS_ERRORS:
+        failed = True
+        return None
     finally:
-        bus.shutdown()
+        bus_pool.release(port, failed)
@@ -0,0 +1,227 @@
+"""
+Test sessions for several test stations on one host.
+
+A station is one Prüfmittel paired with one Prüfgerät on the same test
+bench, i.e. behind the same USB hub. Every browser session gets its own
+TestSession holding the test state that used to live in main.py and claims
+one free station after its scan. Jobs on the ports of a station are
+serialised by the job scheduler.
+"""
+
+import os
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from result import Err, Ok, Result
+from typing_extensions import TypedDict
+
+from .registry import registry
+from .videotest import TestDevice
+
+SESSION_COOKIE = "can_test_session"
+# Sessions ohne Anfrage in dieser Zeit geben ihre Station frei
+SESSION_TTL = 3600.0
+# Seriennummern der Prüfmittel, mehrere durch Komma getrennt
+PRUEFMITTEL_SERIALS = frozenset(
+    os.environ.get("CAN_TEST_PRUEFMITTEL", "380105787").split(","))
+
+
+class Device(TypedDict):
+    serial_number: str
+    firmware: str
+    hardware: str
+    status: str
+    port: str
+
+
+class Station(TypedDict):
+    pruefhilfsmittel: TestDevice
+    pruefgeraet: TestDevice
+    devices: List[Device]
+
+
+def _usb_location(port: str) -> str:
+    port_info = registry.snapshot().get(port)
+    return getattr(port_info, "location", None) or port
+
+
+def bench_of(port: str) -> str:
+    """
+    The USB hub a port hangs on, e.g. "1-1" for location "1-1.2".
+
+    All adapters of one test bench are cabled to the same hub. Adapters
+    without a known location (no registry entry) share the bench "".
+    """
+    port_info = registry.snapshot().get(port)
+    location = getattr(port_info, "location", None)
+    if not location:
+        return ""
+    path = location.partition(":")[0]
+    hub, sep, _ = path.rpartition(".")
+    # Direkt am Root-Hub: alle Adapter dieses Busses
+    return hub if sep else path.partition("-")[0]
+
+
+def _pair_bench(devices: List[Device]) -> Result[List[Station], str]:
+    """Pair the adapters of one bench by role and USB location."""
+    if len(devices) == 1:
+        return Err("Es wurde nur ein USB-CAN Gerät gefunden.")
+
+    pruefmittel = sorted((device for device in devices
+                          if device["serial_number"] in PRUEFMITTEL_SERIALS),
+                         key=lambda device: _usb_location(device["port"]))
+    pruefgeraete = sorted((device for device in devices
+                           if device["serial_number"] not in PRUEFMITTEL_SERIALS),
+                          key=lambda device: _usb_location(device["port"]))
+    if not pruefmittel:
+        return Err("Es wurde kein CAN-Prüfmittel gefunden.")
+    if not pruefgeraete:
+        return Err("Es wurde kein CAN-Prüfgerät gefunden.")
+    if len(pruefmittel) != len(pruefgeraete):
+        return Err(f"{len(pruefmittel)} Prüfmittel und {len(pruefgeraete)} "
+                   f"Prüfgeräte gefunden, sie lassen sich nicht paarweise zuordnen.")
+
+    return Ok([
+        {
+            "pruefhilfsmittel": {"name": "Prüfmittel", "port": mittel["port"]},
+            "pruefgeraet": {"name": "Prüfgerät", "port": geraet["port"]},
+            "devices": [mittel, geraet],
+        }
+        for mittel, geraet in zip(pruefmittel, pruefgeraete)
+    ])
+
+
+def pair_devices(devices: List[Device],
+                 failed: Optional[Dict[str, str]] = None
+                 ) -> Result[List[Station], str]:
+    """
+    Pair the found adapters into stations, bench by bench.
+
+    Adapters are grouped by bench_of(). On each bench Prüfmittel are
+    recognised by their serial number, and both roles are sorted by USB
+    location and paired in that order. A bench with a failed adapter
+    (`failed` maps its port to the error) or with unmatched roles is left
+    out, so one bench cannot take down the others. Err only if no
+    complete station is left.
+    """
+    failed = failed or {}
+    if not devices and not failed:
+        return Err("Es wurden keine USB-CAN Geräte gefunden.")
+
+    benches: Dict[str, List[Device]] = {}
+    for device in devices:
+        benches.setdefault(bench_of(device["port"]), []).append(device)
+    broken: Dict[str, List[str]] = {}
+    for port, error in failed.items():
+        broken.setdefault(bench_of(port), []).append(f"{port}: {error}")
+
+    stations: List[Station] = []
+    problems: List[str] = []
+    for bench in sorted(set(benches) | set(broken)):
+        if bench in broken:
+            problems.extend(broken[bench])
+            continue
+        bench_stations = _pair_bench(benches[bench])
+        if bench_stations.is_err():
+            prefix = f"Hub {bench}: " if bench else ""
+            problems.append(prefix + bench_stations.unwrap_err())
+            continue
+        stations.extend(bench_stations.unwrap())
+
+    if not stations:
+        return Err(" ".join(problems))
+    for problem in problems:
+        print(f"Teststation übersprungen: {problem}")
+    return Ok(stations)
+
+
+class TestSession(object):
+    """Test state of one operator, formerly the globals in main.py."""
+
+    def __init__(self, session_id: str):
+        self.id = session_id
+        self.station: Optional[Station] = None
+        self.reset()
+        self.last_seen = time.monotonic()
+
+    def reset(self):
+        """Forget all test results, e.g. for the next unit on the station."""
+        self.can_status: Optional[Dict[str, Any]] = None
+        self.videosignal_1: Optional[Dict[str, Any]] = None
+        self.videosignal_2: Optional[Dict[str, Any]] = None
+        self.vga_status: Optional[Dict[str, Any]] = None
+        # Fortschritt des laufenden Scans, abrufbar über /scan-status
+        self.scan_progress: Dict[str, Any] = {"running": False, "devices": []}
+
+    @property
+    def pruefhilfsmittel(self) -> Optional[TestDevice]:
+        return self.station["pruefhilfsmittel"] if self.station else None
+
+    @property
+    def pruefgeraet(self) -> Optional[TestDevice]:
+        return self.station["pruefgeraet"] if self.station else None
+
+    def ports(self) -> List[str]:
+        if self.station is None:
+            return []
+        return [self.station["pruefhilfsmittel"]["port"],
+                self.station["pruefgeraet"]["port"]]
+
+
+class SessionStore(object):
+    """All sessions of the web app and the stations they hold."""
+
+    def __init__(self, ttl: float = SESSION_TTL):
+        self.ttl = ttl
+        self._sessions: Dict[str, TestSession] = {}
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex
+
+    def get(self, session_id: str) -> TestSession:
+        """Return the session, creating it on first use."""
+        self._expire()
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = TestSession(session_id)
+        session.last_seen = time.monotonic()
+        return session
+
+    def _expire(self):
+        deadline = time.monotonic() - self.ttl
+        for session_id in [session_id for session_id, session
+                           in self._sessions.items()
+                           if session.last_seen < deadline]:
+            del self._sessions[session_id]
+
+    def ports_in_use(self, exclude: Optional[TestSession] = None) -> List[str]:
+        """Ports of the stations claimed by other sessions."""
+        return [port for session in self._sessions.values()
+                if session is not exclude for port in session.ports()]
+
+    def claim_station(self, session: TestSession,
+                      stations: List[Station]) -> Result[Station, str]:
+        """
+        Give `session` the first station no other session holds.
+
+        A session keeps its current station if it is still present.
+        """
+        taken = set(self.ports_in_use(exclude=session))
+        free = [station for station in stations
+                if station["pruefhilfsmittel"]["port"] not in taken
+                and station["pruefgeraet"]["port"] not in taken]
+        if not free:
+            session.station = None
+            return Err("Alle Teststationen sind bereits belegt.")
+        current = session.ports()
+        session.station = next(
+            (station for station in free
+             if [station["pruefhilfsmittel"]["port"],
+                 station["pruefgeraet"]["port"]] == current),
+            free[0])
+        return Ok(session.station)
+
+
+sessions = SessionStore()
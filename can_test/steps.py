@@ -0,0 +1,220 @@
+"""
+The steps of the production test, independent of the web UI.
+
+Each step runs as a job on the scheduler, records its outcome in the
+TestSession the way the report expects it and returns a Result. The web
+endpoints only render these results; test plans and the command line
+runner call the steps directly.
+"""
+
+import asyncio
+import functools
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from result import Err, Ok, Result
+
+from .buspool import bus_pool
+from .receive import received_image_path
+from .registry import start_registry
+from .scanner import FoundDevice, FoundDeviceError, initialize_async
+from .scheduler import JobTimeout, scheduler
+from .session import Device, Station, TestSession, pair_devices, sessions
+from .videotest import run_duplex_video_test, run_video_test
+
+NO_STATION = "Es ist keine Teststation zugeordnet. Bitte starten Sie zuerst den Scan."
+
+
+def record_scan_result(session: TestSession, port: str,
+                       device_info: Result[FoundDevice, FoundDeviceError]):
+    if device_info.is_ok():
+        entry = dict(device_info.unwrap(), port=port)
+    else:
+        entry = dict(device_info.unwrap_err())
+    session.scan_progress["devices"].append(entry)
+
+
+def _found_devices(found: Dict[str, Any], in_use: List[str]
+                   ) -> Tuple[List[Device], Dict[str, str]]:
+    """The identified adapters and the errors of the failed ports."""
+    devices: List[Device] = []
+    failed: Dict[str, str] = {}
+    for device, port in zip(found["devices"], found["ports"]):
+        if device.is_err():
+            # Ports anderer Teststationen zählen hier nicht
+            if port not in in_use:
+                failed[port] = device.unwrap_err()['error']
+            continue
+        device_result = device.unwrap()
+        devices.append({
+            "serial_number": device_result["serial_number"],
+            "hardware": device_result["hardware"],
+            "firmware": device_result["firmware"],
+            "status": device_result["status"],
+            "port": port
+        })
+    return devices, failed
+
+
+async def scan_station(session: TestSession) -> Result[Station, str]:
+    """Scan the adapters and claim a station for `session`."""
+    # Ports anderer Teststationen werden nicht angesprochen
+    in_use = sessions.ports_in_use(exclude=session)
+    # Ein Scan belegt alle freien Ports, Scans laufen also nacheinander
+    scan_ports = [port for port in start_registry().ports()
+                  if port not in in_use]
+
+    async def scan():
+        session.scan_progress = {
+            "running": True,
+            "started": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "devices": []
+        }
+        # Offene Busse aus dem Pool würden die Abfrage der Adapter stören
+        await asyncio.to_thread(bus_pool.close, scan_ports)
+        try:
+            return await initialize_async(
+                on_result=functools.partial(record_scan_result, session),
+                in_use=in_use)
+        finally:
+            session.scan_progress["running"] = False
+
+    try:
+        initialize_result: Result[Dict[str, Any], str] = await scheduler.run(
+            "scan", scan, resources=scan_ports)
+    except JobTimeout as e:
+        initialize_result = Err(str(e))
+
+    if initialize_result.is_err():
+        session.can_status = {
+            "Status": "fail",
+            "Fehler": initialize_result.unwrap_err(),
+            "Datum": datetime.now().strftime('%d.%m.%Y %H:%M:%S')
+        }
+        return initialize_result
+
+    # Eine defekte oder unvollständige Teststation fällt allein aus
+    devices, failed = _found_devices(initialize_result.unwrap(), in_use)
+    station = pair_devices(devices, failed).and_then(
+        lambda stations: sessions.claim_station(session, stations))
+    if station.is_err():
+        session.can_status = {
+            "Status": "fail",
+            "device_filtering": "failed",
+            "Fehlermeldung": station.unwrap_err(),
+            "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+        return station
+
+    session.can_status = {
+        "Status": "pass",
+        "devices": station.unwrap()["devices"],
+        "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+    return station
+
+
+def video_status(result: Result[Dict[str, Any], str]) -> Dict[str, Any]:
+    """Report entry for a videosignal test."""
+    if result.is_err():
+        return {"Status": "fail", "Grund": result.unwrap_err()}
+    return result.unwrap()
+
+
+def video_image_path(session: TestSession, number: int) -> Path:
+    """Where videosignal test `number` (1 or 2) stores its image."""
+    receiver = session.pruefgeraet if number == 1 else session.pruefhilfsmittel
+    return received_image_path(receiver["port"])
+
+
+async def videosignal_test(session: TestSession,
+                           number: int) -> Result[Dict[str, Any], str]:
+    """
+    Videosignal test 1 (Prüfmittel -> Prüfgerät) or 2 (Prüfgerät ->
+    Prüfmittel) on the station of `session`.
+    """
+    if session.station is None:
+        result = Err(NO_STATION)
+    else:
+        if number == 1:
+            receiver, sender = session.pruefgeraet, session.pruefhilfsmittel
+        else:
+            receiver, sender = session.pruefhilfsmittel, session.pruefgeraet
+        path = video_image_path(session, number)
+        try:
+            result = await scheduler.run(
+                "video",
+                lambda: run_video_test(receiver=receiver, sender=sender,
+                                       path=path),
+                resources=session.ports())
+        except JobTimeout as e:
+            result = Err(str(e))
+
+    if number == 1:
+        session.videosignal_1 = video_status(result)
+    else:
+        session.videosignal_2 = video_status(result)
+    return result
+
+
+async def duplex_videosignal_test(
+        session: TestSession
+) -> Tuple[Result[Dict[str, Any], str], Result[Dict[str, Any], str]]:
+    """Videosignal tests 1 and 2 at the same time on distinct IDs."""
+    if session.station is None:
+        result_1 = result_2 = Err(NO_STATION)
+    else:
+        paths = (video_image_path(session, 1), video_image_path(session, 2))
+        try:
+            result_1, result_2 = await scheduler.run(
+                "video",
+                lambda: run_duplex_video_test(session.pruefgeraet,
+                                              session.pruefhilfsmittel,
+                                              paths=paths),
+                resources=session.ports())
+        except JobTimeout as e:
+            result_1 = result_2 = Err(str(e))
+
+    session.videosignal_1 = video_status(result_1)
+    session.videosignal_2 = video_status(result_2)
+    return result_1, result_2
+
+
+async def vga_test(session: TestSession) -> Result[Any, str]:
+    """Check for the DP-VGA adapter."""
+    # pymonctl braucht eine Anzeige und wird erst hier geladen
+    from .screen import check_vga_adapter
+
+    try:
+        scan_result = await scheduler.run("vga", check_vga_adapter,
+                                          resources=["display"])
+    except JobTimeout as e:
+        scan_result = Err(str(e))
+
+    if scan_result.is_ok():
+        session.vga_status = {
+            "Status": "pass",
+            "Grund": scan_result.unwrap(),
+        }
+    else:
+        session.vga_status = {
+            "Status": "fail",
+            "Grund": scan_result.unwrap_err(),
+        }
+    return scan_result
+
+
+async def create_report(session: TestSession) -> Result[None, str]:
+    """Write the PDF report of everything `session` has tested."""
+    from .report import TestReport
+
+    report = TestReport(can_report=session.can_status,
+                        videosignal_1=session.videosignal_1,
+                        videosignal_2=session.videosignal_2,
+                        vga_status=session.vga_status)
+    try:
+        await scheduler.run("report", lambda: asyncio.to_thread(report.main))
+    except (JobTimeout, OSError) as e:
+        return Err(f"Der Testreport konnte nicht gespeichert werden: {e}")
+    return Ok(None)
@@ -0,0 +1,158 @@
+"""
+Test plans: the test steps as a dependency graph.
+
+Every step names the steps it requires (it only runs if they passed) and
+the steps it merely runs after. run_plan() starts each step as soon as
+its dependencies are done, so independent steps run at the same time and
+a whole plan takes as long as its longest chain of dependent steps.
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List
+
+from result import Err, Ok, Result
+from typing_extensions import TypedDict
+
+from .session import TestSession
+from .steps import (create_report, duplex_videosignal_test, scan_station,
+                    vga_test, videosignal_test)
+
+
+class PlanStep(object):
+    """One node of a test plan."""
+
+    def __init__(self, name: str, run: Callable[[], Awaitable[Result]],
+                 requires: Iterable[str] = (), after: Iterable[str] = ()):
+        self.name = name
+        self.run = run
+        self.requires = tuple(requires)
+        self.after = tuple(after)
+
+    @property
+    def dependencies(self):
+        return self.requires + self.after
+
+
+class StepResult(TypedDict):
+    Status: str
+    Grund: str
+    Dauer: str
+
+
+def ordered_steps(steps: List[PlanStep]) -> List[PlanStep]:
+    """
+    Return the steps in dependency order.
+
+    Raises ValueError for duplicate names, unknown dependencies and
+    cycles.
+    """
+    by_name: Dict[str, PlanStep] = {}
+    for step in steps:
+        if step.name in by_name:
+            raise ValueError(f"Schritt '{step.name}' ist doppelt im Testplan")
+        by_name[step.name] = step
+    for step in steps:
+        for name in step.dependencies:
+            if name not in by_name:
+                raise ValueError(f"Schritt '{step.name}' hängt vom unbekannten "
+                                 f"Schritt '{name}' ab")
+
+    ordered: List[PlanStep] = []
+    done = set()
+    visiting = set()
+
+    def visit(step: PlanStep):
+        if step.name in done:
+            return
+        if step.name in visiting:
+            raise ValueError(f"Der Testplan enthält einen Zyklus über '{step.name}'")
+        visiting.add(step.name)
+        for name in step.dependencies:
+            visit(by_name[name])
+        visiting.discard(step.name)
+        done.add(step.name)
+        ordered.append(step)
+
+    for step in steps:
+        visit(step)
+    return ordered
+
+
+async def run_plan(steps: List[PlanStep]) -> Result[Dict[str, StepResult], Dict[str, StepResult]]:
+    """
+    Run a test plan and return one entry per step.
+
+    Ok if every step passed, Err with the same entries otherwise. A step
+    whose required steps failed is skipped; an exception in a step counts
+    as its failure.
+    """
+    tasks: Dict[str, asyncio.Task] = {}
+    durations: Dict[str, float] = {}
+
+    async def run_step(step: PlanStep) -> Result[Any, str]:
+        await asyncio.gather(*(tasks[name] for name in step.dependencies))
+        durations[step.name] = 0.0
+        failed = [name for name in step.requires
+                  if tasks[name].result().is_err()]
+        if failed:
+            return Err(f"Übersprungen, da {', '.join(failed)} fehlgeschlagen")
+        started = time.perf_counter()
+        try:
+            return await step.run()
+        except Exception as e:
+            return Err(f"{type(e).__name__}: {e}")
+        finally:
+            durations[step.name] = time.perf_counter() - started
+
+    for step in ordered_steps(steps):
+        tasks[step.name] = asyncio.ensure_future(run_step(step))
+    await asyncio.gather(*tasks.values())
+
+    summary: Dict[str, StepResult] = {}
+    for name, task in tasks.items():
+        result = task.result()
+        summary[name] = {
+            "Status": "pass" if result.is_ok() else "fail",
+            "Grund": ("Erfolgreich durchgeführt" if result.is_ok()
+                      else str(result.unwrap_err())),
+            "Dauer": f"{durations[name]:.2f} s",
+        }
+    if all(entry["Status"] == "pass" for entry in summary.values()):
+        return Ok(summary)
+    return Err(summary)
+
+
+def production_plan(session: TestSession, duplex: bool = True,
+                    vga: bool = True, report: bool = True) -> List[PlanStep]:
+    """
+    The full test of one unit: scan, both videosignal tests, the VGA
+    check and the report.
+
+    The videosignal tests need the station found by the scan; the VGA
+    check does not touch the CAN adapters and runs alongside. The report
+    is written last, also when steps failed, so it records the failures.
+    With `duplex` both videosignal tests run as one duplex transfer;
+    `vga` and `report` can be switched off.
+    """
+    async def duplex_test():
+        result_1, result_2 = await duplex_videosignal_test(session)
+        return result_1.and_then(lambda _: result_2)
+
+    if duplex:
+        video_steps = [PlanStep("videosignal", duplex_test, requires=["scan"])]
+    else:
+        video_steps = [
+            PlanStep("videosignal_1", lambda: videosignal_test(session, 1),
+                     requires=["scan"]),
+            # Beide Tests nutzen dieselben Ports und laufen nacheinander
+            PlanStep("videosignal_2", lambda: videosignal_test(session, 2),
+                     requires=["scan"], after=["videosignal_1"]),
+        ]
+    steps = [PlanStep("scan", lambda: scan_station(session)), *video_steps]
+    if vga:
+        steps.append(PlanStep("vga", lambda: vga_test(session)))
+    if report:
+        steps.append(PlanStep("report", lambda: create_report(session),
+                              after=[step.name for step in steps]))
+    return steps
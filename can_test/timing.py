@@ -0,0 +1,171 @@
+"""
+Frame pacing for CAN transmissions.
+
+TokenBucketPacer hands out send times so that the frames sent take up a
+target share of the bus bandwidth, based on the worst-case bit length of
+each frame. DeadlineScheduler waits for those absolute deadlines with a
+sleep-then-spin loop and records how late each frame actually went out.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+from typing_extensions import TypedDict
+
+# Standard-Frames: SOF, 11 Bit ID, RTR, IDE, r0, DLC und CRC.
+STD_STUFFED_BITS = 34
+# Erweiterte Frames: SOF, 29 Bit ID, SRR, IDE, RTR, r1, r0, DLC und CRC.
+EXT_STUFFED_BITS = 54
+# CRC-Delimiter, ACK, EOF und Interframe Space werden nicht gestopft.
+TRAILER_BITS = 13
+TARGET_BUS_LOAD = 0.8
+# time.sleep() overshoots by 50-200 µs on Linux; spin for the last part.
+SPIN_THRESHOLD_NS = 300_000
+# Obergrenzen der Histogramm-Klassen für die Verspätung in µs.
+JITTER_BUCKETS_US = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+def frame_bits(dlc, extended=False, stuffing=True):
+    """Worst-case length of a classic CAN data frame on the wire."""
+    stuffed = (EXT_STUFFED_BITS if extended else STD_STUFFED_BITS) + 8 * dlc
+    if stuffing:
+        stuffed += (stuffed - 1) // 4
+    return stuffed + TRAILER_BITS
+
+
+def message_bits(msg):
+    """frame_bits() for a can.Message."""
+    return frame_bits(msg.dlc, msg.is_extended_id)
+
+
+class JitterStats(TypedDict):
+    samples: int
+    mean_us: float
+    max_us: float
+    histogram: Dict[str, int]
+
+
+class TransferStats(TypedDict):
+    frames: int
+    bytes: int
+    duration_s: float
+    frames_per_second: float
+    bus_load: float
+    jitter: Optional[JitterStats]
+
+
+class TokenBucketPacer(object):
+    """
+    Token bucket in bits, refilled at `target_load` x `bitrate` bits/s.
+
+    next_send_time() returns the absolute perf_counter_ns() time at which
+    a frame may go out. Tokens may go negative; the debt is paid off by the
+    refill, so late wake-ups do not reduce the average rate.
+    """
+
+    def __init__(self, bitrate, target_load=TARGET_BUS_LOAD, burst_bits=None):
+        if not 0 < target_load <= 1:
+            raise ValueError("target_load must be in (0, 1]")
+        self.bitrate = bitrate
+        self.rate = bitrate * target_load
+        self.capacity = burst_bits if burst_bits is not None else frame_bits(8, True)
+        self.tokens = self.capacity
+        self.last = None
+        self.bits_sent = 0
+        self.frames_sent = 0
+        self.start = None
+
+    def next_send_time(self, bits, frames=1):
+        """Reserve `bits` for `frames` frames and return when to send them."""
+        now = time.perf_counter_ns()
+        if self.last is None:
+            self.start = self.last = now
+        self.tokens = min(self.capacity,
+                          self.tokens + (now - self.last) * self.rate / 1e9)
+        self.last = now
+        self.tokens -= bits
+        self.bits_sent += bits
+        self.frames_sent += frames
+        if self.tokens >= 0:
+            return now
+        return now + int(-self.tokens / self.rate * 1e9)
+
+    def stats(self, payload_bytes=0, jitter=None) -> TransferStats:
+        """Achieved rate since the first reserved frame."""
+        duration = ((time.perf_counter_ns() - self.start) / 1e9
+                    if self.start is not None else 0.0)
+        return {
+            "frames": self.frames_sent,
+            "bytes": payload_bytes,
+            "duration_s": duration,
+            "frames_per_second": self.frames_sent / duration if duration else 0.0,
+            "bus_load": self.bits_sent / (duration * self.bitrate) if duration else 0.0,
+            "jitter": jitter,
+        }
+
+
+class DeadlineScheduler(object):
+    """
+    Wait for absolute perf_counter_ns() deadlines.
+
+    Sleeps until `spin_ns` before the deadline and busy-waits the rest.
+    Deadlines are absolute, so a late frame does not shift the following
+    ones. With `cpu` set, pinned() binds the calling thread to that CPU
+    (Linux only) while frames are sent.
+    """
+
+    def __init__(self, spin_ns=SPIN_THRESHOLD_NS, cpu=None):
+        self.spin_ns = spin_ns
+        self.cpu = cpu
+        self._lateness_sum = 0
+        self._lateness_max = 0
+        self._samples = 0
+        self._buckets = [0] * (len(JITTER_BUCKETS_US) + 1)
+
+    @contextmanager
+    def pinned(self):
+        """Pin the calling thread to `cpu` for the duration of the block."""
+        if self.cpu is None or not hasattr(os, "sched_setaffinity"):
+            yield
+            return
+        previous = os.sched_getaffinity(0)
+        os.sched_setaffinity(0, {self.cpu})
+        try:
+            yield
+        finally:
+            os.sched_setaffinity(0, previous)
+
+    def wait_until(self, deadline_ns):
+        """Return at `deadline_ns` at the earliest and record the lateness."""
+        remaining = deadline_ns - time.perf_counter_ns()
+        if remaining > self.spin_ns:
+            time.sleep((remaining - self.spin_ns) / 1e9)
+        now = time.perf_counter_ns()
+        while now < deadline_ns:
+            now = time.perf_counter_ns()
+        self.record(now - deadline_ns)
+
+    def record(self, lateness_ns):
+        self._samples += 1
+        self._lateness_sum += lateness_ns
+        self._lateness_max = max(self._lateness_max, lateness_ns)
+        lateness_us = lateness_ns / 1000
+        for idx, limit in enumerate(JITTER_BUCKETS_US):
+            if lateness_us <= limit:
+                self._buckets[idx] += 1
+                break
+        else:
+            self._buckets[-1] += 1
+
+    def jitter(self) -> JitterStats:
+        """Lateness statistics of all waits so far."""
+        labels = [f"<={limit}us" for limit in JITTER_BUCKETS_US]
+        labels.append(f">{JITTER_BUCKETS_US[-1]}us")
+        return {
+            "samples": self._samples,
+            "mean_us": (self._lateness_sum / self._samples / 1000
+                        if self._samples else 0.0),
+            "max_us": self._lateness_max / 1000,
+            "histogram": dict(zip(labels, self._buckets)),
+        }
@@ -0,0 +1,202 @@
+"""
+Videosignal tests: one adapter sends the test image, the other receives it.
+
+run_video_test() finishes as soon as the receiver has a verified image or
+either side fails, and reports what was actually received.
+run_duplex_video_test() runs both directions at once on distinct IDs.
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+from result import Err, Ok, Result
+from typing_extensions import TypedDict
+
+from .buspool import BUS_ERRORS, bus_pool
+from .receive import (IMAGE_FILTERS, RECEIVE_TIMEOUT, RECEIVED_IMAGE_PATH,
+                      REVERSE_FILTERS, REVERSE_IMAGE_PATH, receive_image_async,
+                      receive_image_on_bus)
+from .send import (IMAGE_ARBITRATION_ID, REVERSE_ARBITRATION_ID,
+                   load_image_payload, send_image, send_image_over_can)
+from .timing import TARGET_BUS_LOAD
+
+BITRATE = 100000
+
+
+class TestDevice(TypedDict):
+    name: str
+    port: str
+
+
+async def _finish_transfer(receiver: TestDevice, sender: TestDevice,
+                           receive_task, send_task, stop_event,
+                           started: float) -> Result[Dict[str, Any], str]:
+    """Wait for one direction to finish and build its report entry."""
+    try:
+        done, _ = await asyncio.wait({receive_task, send_task},
+                                     return_when=asyncio.FIRST_COMPLETED)
+        if (send_task in done and send_task.result() is None
+                and not receive_task.done()):
+            receive_task.cancel()
+            await asyncio.gather(receive_task, return_exceptions=True)
+            return Err(f"Das Senden des Testbilds über '{sender['name']}' ist fehlgeschlagen.")
+
+        received = await receive_task
+    finally:
+        stop_event.set()
+        stats = await send_task
+
+    if received.is_err():
+        return Err(f"{receiver['name']}: {received.unwrap_err()}")
+
+    image = received.unwrap()
+    if image["sha256"] != hashlib.sha256(load_image_payload()).hexdigest():
+        return Err(f"{receiver['name']}: Empfangenes Bild weicht vom gesendeten ab.")
+
+    report = {
+        "Status": "pass",
+        "Grund": "Kommunikation erfolgreich durchgeführt",
+        "Sender": sender["name"],
+        "Empfänger": receiver["name"],
+        "Empfangen": f"{image['size']} Bytes",
+        "Übertragungszeit": f"{image['duration_s']:.2f} s",
+        "Testdauer": f"{time.perf_counter() - started:.2f} s",
+    }
+    if stats is not None:
+        report["Buslast"] = f"{stats['bus_load'] * 100:.0f} %"
+    return Ok(report)
+
+
+async def run_video_test(receiver: TestDevice, sender: TestDevice,
+                         bitrate: int = BITRATE,
+                         timeout: float = RECEIVE_TIMEOUT,
+                         interface: str = 'slcan',
+                         path: Path = RECEIVED_IMAGE_PATH) -> Result[Dict[str, Any], str]:
+    """
+    Send the test image from `sender` to `receiver`.
+
+    Returns the report entry for the test on success, or the reason it
+    failed. The sender only starts once the receiver is listening. The
+    received image is stored at `path`.
+    """
+    started = time.perf_counter()
+    ready = asyncio.Event()
+    receive_task = asyncio.ensure_future(
+        receive_image_async(receiver["port"], bitrate, timeout, interface,
+                            ready=ready, path=path))
+    ready_task = asyncio.ensure_future(ready.wait())
+    await asyncio.wait({receive_task, ready_task},
+                       return_when=asyncio.FIRST_COMPLETED)
+    ready_task.cancel()
+    if receive_task.done():
+        return Err(f"{receiver['name']}: {receive_task.result().unwrap_err()}")
+
+    stop_event = threading.Event()
+    send_task = asyncio.ensure_future(asyncio.to_thread(
+        send_image_over_can, sender["port"], bitrate, stop_event,
+        interface=interface))
+    return await _finish_transfer(receiver, sender, receive_task, send_task,
+                                  stop_event, started)
+
+
+async def run_duplex_video_test(
+        first: TestDevice, second: TestDevice, bitrate: int = BITRATE,
+        timeout: float = RECEIVE_TIMEOUT, interface: str = 'slcan',
+        bus_load: float = TARGET_BUS_LOAD,
+        paths: Tuple[Path, Path] = (RECEIVED_IMAGE_PATH, REVERSE_IMAGE_PATH)
+) -> Tuple[Result[Dict[str, Any], str], Result[Dict[str, Any], str]]:
+    """
+    Send the test image in both directions at the same time.
+
+    `second` sends to `first` on IMAGE_ARBITRATION_ID while `first` sends
+    to `second` on REVERSE_ARBITRATION_ID, so both frame streams compete
+    for the bus. Each adapter sends and receives over one bus leased from
+    the bus pool; each direction gets half of `bus_load`. Returns the results of the
+    second -> first and the first -> second direction; their images are
+    stored at `paths`.
+    """
+    started = time.perf_counter()
+    # Prüfling empfängt ID 0x100, Gegenstelle ID 0x101
+    filters = ((first, IMAGE_FILTERS), (second, REVERSE_FILTERS))
+    opened = await asyncio.gather(
+        *(bus_pool.acquire_async(device["port"], bitrate, interface,
+                                 can_filters)
+          for device, can_filters in filters),
+        return_exceptions=True)
+    leased = [device["port"] for (device, _), bus in zip(filters, opened)
+              if not isinstance(bus, BaseException)]
+    # Nur ein Bus, der selbst ausgefallen ist, wird neu geöffnet
+    failed_ports = set()
+    try:
+        for (device, _), bus in zip(filters, opened):
+            if isinstance(bus, BaseException):
+                error = Err(f"{device['name']}: Der CAN-Bus an "
+                            f"{device['port']} konnte nicht geöffnet werden: {bus}")
+                return error, error
+        first_bus, second_bus = opened
+
+        directions = (
+            (first, second, first_bus, second_bus, IMAGE_ARBITRATION_ID,
+             paths[0]),
+            (second, first, second_bus, first_bus, REVERSE_ARBITRATION_ID,
+             paths[1]),
+        )
+        async def receive(receiver, rx_bus, ready, path):
+            try:
+                return await receive_image_on_bus(rx_bus, receiver["port"],
+                                                  timeout, ready, path)
+            except BUS_ERRORS as e:
+                failed_ports.add(receiver["port"])
+                return Err(f"Der CAN-Bus an {receiver['port']} ist ausgefallen: {e}")
+
+        def send(sender, tx_bus, stop_event, arbitration_id):
+            try:
+                return send_image(tx_bus, bitrate, stop_event, bus_load / 2,
+                                  arbitration_id=arbitration_id)
+            except BUS_ERRORS:
+                failed_ports.add(sender["port"])
+                return None
+
+        ready_events = [asyncio.Event() for _ in directions]
+        receive_tasks = [
+            asyncio.ensure_future(receive(receiver, rx_bus, ready, path))
+            for (receiver, _, rx_bus, _, _, path), ready
+            in zip(directions, ready_events)
+        ]
+        all_ready = asyncio.ensure_future(
+            asyncio.gather(*(ready.wait() for ready in ready_events)))
+        await asyncio.wait({all_ready, *receive_tasks},
+                           return_when=asyncio.FIRST_COMPLETED)
+        all_ready.cancel()
+        # Ein Empfänger, der vor dem Lauschen endet, ist fehlgeschlagen
+        for (receiver, *_), receive_task in zip(directions, receive_tasks):
+            if receive_task.done():
+                for task in receive_tasks:
+                    task.cancel()
+                await asyncio.gather(*receive_tasks, return_exceptions=True)
+                error = Err(f"{receiver['name']}: "
+                            f"{receive_task.result().unwrap_err()}")
+                return error, error
+
+        # Beide Richtungen starten erst, wenn beide Empfänger lauschen
+        stop_events = [threading.Event() for _ in directions]
+        send_tasks = [
+            asyncio.ensure_future(asyncio.to_thread(
+                send, sender, tx_bus, stop_event, arbitration_id))
+            for (_, sender, _, tx_bus, arbitration_id, _), stop_event
+            in zip(directions, stop_events)
+        ]
+        results = await asyncio.gather(*(
+            _finish_transfer(receiver, sender, receive_task, send_task,
+                             stop_event, started)
+            for (receiver, sender, *_), receive_task, send_task, stop_event
+            in zip(directions, receive_tasks, send_tasks, stop_events)))
+        return results[0], results[1]
+    finally:
+        await asyncio.gather(*(bus_pool.release_async(port,
+                                                      port in failed_ports)
+                               for port in leased))
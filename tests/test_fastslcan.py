@@ -0,0 +1,57 @@
+import pytest
+
+from can_test.fastslcan import FastSlcanBus
+from can_test.receive import IMAGE_FILTERS, _DrainingNotifier
+
+
+class Collector(object):
+    def __init__(self):
+        self.messages = []
+
+    def _on_message_received(self, msg):
+        self.messages.append(msg)
+
+
+@pytest.fixture
+def bus():
+    # loop:// echoes every write back, like frames arriving from the bus
+    bus = FastSlcanBus("loop://", sleep_after_open=0)
+    bus.flush()
+    yield bus
+    bus.shutdown()
+
+
+def feed(bus, *lines):
+    bus.serialPortOrig.write(b"".join(lines))
+
+
+def test_foreign_frame_does_not_strand_image_frames(bus):
+    bus.set_filters(IMAGE_FILTERS)
+    feed(bus, b"t2008DEADBEEF00000000\r",
+         b"t10080001020304050607\r",
+         b"t10080807060504030201\r",
+         b"t1002ABCD\r")
+
+    collector = Collector()
+    _DrainingNotifier._on_message_available(collector, bus)
+
+    assert [msg.arbitration_id for msg in collector.messages] == [0x100] * 3
+    assert not bus._pending
+
+
+def test_foreign_frames_only_yield_nothing(bus):
+    bus.set_filters(IMAGE_FILTERS)
+    feed(bus, b"t2001AA\r", b"t3001BB\r")
+
+    assert bus.recv(0) is None
+    assert not bus._pending
+
+
+def test_no_filters_pass_everything(bus):
+    feed(bus, b"t2001AA\r", b"t1001BB\r")
+
+    ids = []
+    while (msg := bus.recv(0)) is not None:
+        ids.append(msg.arbitration_id)
+
+    assert ids == [0x200, 0x100]
@@ -0,0 +1,151 @@
+import asyncio
+
+from can_test import netcan
+
+
+class SlcanStandIn(object):
+    """Local TCP server that answers C/N/V like a NetCAN Plus."""
+
+    def __init__(self, serial_number=42, delay=0.0, silent=False):
+        self.serial_number = serial_number
+        self.delay = delay
+        self.silent = silent
+        self.active = 0
+        self.max_active = 0
+        self.connections = 0
+        self.server = None
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.server.close()
+        await self.server.wait_closed()
+
+    @property
+    def target(self):
+        return "127.0.0.1:%d" % self.server.sockets[0].getsockname()[1]
+
+    def reply(self, command):
+        if command == b"C":
+            return b"\r"
+        if command == b"N":
+            return b"N%08d \r" % self.serial_number
+        if command == b"V":
+            return b"V1234\r"
+        return b"\x07"
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        buf = b""
+        try:
+            while not self.silent:
+                data = await reader.read(64)
+                if not data:
+                    break
+                buf += data
+                *commands, buf = buf.split(b"\r")
+                for command in commands:
+                    await asyncio.sleep(self.delay)
+                    if command == b"V":
+                        # Count down before the last reply, so the next
+                        # client can only connect afterwards.
+                        self.active -= 1
+                    writer.write(self.reply(command))
+                    await writer.drain()
+            if self.silent:
+                await reader.read()
+        finally:
+            writer.close()
+
+
+def test_probe_identifies_stand_in():
+    async def probe():
+        async with SlcanStandIn(serial_number=380105787) as stand_in:
+            return await netcan.probe_netcans([stand_in.target])
+
+    [(url, result)] = asyncio.run(probe())
+
+    assert url.startswith("socket://127.0.0.1:")
+    assert result.unwrap() == {"serial_number": "380105787",
+                               "firmware": "3:4", "hardware": "1:2",
+                               "status": "success"}
+
+
+def test_unresponsive_host_times_out(monkeypatch):
+    async def never_connects(host, port):
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(netcan, "CONNECT_TIMEOUT", 0.1)
+    monkeypatch.setattr(netcan.asyncio, "open_connection", never_connects)
+
+    result = asyncio.run(netcan.probe_netcan("192.0.2.1"))
+
+    assert "Failed to connect" in result.unwrap_err()
+
+
+def test_silent_adapter_fails_identify():
+    async def probe():
+        async with SlcanStandIn(silent=True) as stand_in:
+            host, port = stand_in.target.split(":")
+            return await netcan.probe_netcan(host, int(port), timeout=0.2)
+
+    result = asyncio.run(probe())
+
+    assert result.unwrap_err() == "Failed to identify the device"
+
+
+def test_probes_respect_concurrency_limit():
+    async def probe():
+        async with SlcanStandIn(delay=0.02) as stand_in:
+            results = await netcan.probe_netcans([stand_in.target] * 10,
+                                                 concurrency=3)
+            return stand_in, results
+
+    stand_in, results = asyncio.run(probe())
+
+    assert all(result.is_ok() for _, result in results)
+    assert stand_in.connections == 10
+    assert stand_in.max_active == 3
+
+
+def test_expand_targets_cidr_and_host_port():
+    targets = ["192.168.7.0/30", "10.0.0.9/32", "netcan.local:3000",
+               "socket://10.0.0.5:2002", "10.0.0.6"]
+
+    assert netcan.expand_targets(targets) == [
+        ("192.168.7.1", netcan.NETCAN_TCP_PORT),
+        ("192.168.7.2", netcan.NETCAN_TCP_PORT),
+        ("10.0.0.9", netcan.NETCAN_TCP_PORT),
+        ("netcan.local", 3000),
+        ("10.0.0.5", 2002),
+        ("10.0.0.6", netcan.NETCAN_TCP_PORT),
+    ]
+
+
+def test_expand_targets_uses_given_port():
+    assert netcan.expand_targets(["10.1.0.0/31"], port=4000) == [
+        ("10.1.0.0", 4000), ("10.1.0.1", 4000)]
+
+
+def test_scan_devices_limits_netcan_connections(monkeypatch):
+    from can_test import scanner
+
+    monkeypatch.setattr(netcan, "PROBE_CONCURRENCY", 3)
+    monkeypatch.setattr(scanner, "find_all_usb_can_devices",
+                        lambda: scanner.Err("No devices found"))
+
+    async def scan():
+        async with SlcanStandIn(delay=0.02) as stand_in:
+            results = [item async for item in scanner.scan_devices(
+                hosts=[stand_in.target] * 10)]
+            return stand_in, results
+
+    stand_in, results = asyncio.run(scan())
+
+    assert len(results) == 10
+    assert all(info.is_ok() for _, _, info in results)
+    assert stand_in.max_active == 3
@@ -0,0 +1,66 @@
+import struct
+
+import pytest
+
+from can_test.pngstream import PngError, PngStreamValidator
+from can_test.send import FRAME_SIZE, load_image_payload
+
+
+def chunk_offsets(payload):
+    """(type, start, end) of every chunk, end including the CRC."""
+    chunks = []
+    pos = 8
+    while pos < len(payload):
+        length, chunk_type = struct.unpack(">I4s", payload[pos:pos + 8])
+        end = pos + 12 + length
+        chunks.append((chunk_type, pos, end))
+        pos = end
+    return chunks
+
+
+def frames(payload):
+    padded = payload + bytes(-len(payload) % FRAME_SIZE)
+    return [padded[i:i + FRAME_SIZE] for i in range(0, len(padded), FRAME_SIZE)]
+
+
+def test_image_in_frames_completes_with_its_size():
+    payload = load_image_payload()
+    validator = PngStreamValidator()
+
+    completed = [validator.feed(frame) for frame in frames(payload)]
+
+    assert completed[-1] is True
+    assert not any(completed[:-1])
+    assert validator.complete
+    assert validator.total == len(payload)
+
+
+def test_flipped_idat_byte_fails_in_that_chunk():
+    payload = bytearray(load_image_payload())
+    chunks = chunk_offsets(payload)
+    _, idat_start, idat_end = next(chunk for chunk in chunks
+                                   if chunk[0] == b"IDAT")
+    _, iend_start, _ = chunks[-1]
+    payload[idat_start + 8 + 10] ^= 0xFF
+    validator = PngStreamValidator()
+
+    fed = 0
+    with pytest.raises(PngError):
+        for frame in frames(bytes(payload)):
+            fed += len(frame)
+            validator.feed(frame)
+
+    assert fed <= idat_end + FRAME_SIZE
+    assert fed < iend_start
+
+
+def test_missing_iend_never_completes():
+    payload = load_image_payload()
+    _, iend_start, _ = chunk_offsets(payload)[-1]
+    validator = PngStreamValidator()
+
+    completed = [validator.feed(frame)
+                 for frame in frames(payload[:iend_start])]
+
+    assert not any(completed)
+    assert not validator.complete
@@ -0,0 +1,90 @@
+import time
+
+from result import Ok
+
+from can_test import scanner
+
+
+def fake_process_device(delays):
+    def process_device(port):
+        time.sleep(delays[port])
+        return Ok({"serial_number": port, "firmware": "3:4",
+                   "hardware": "1:2", "status": "success"})
+    return process_device
+
+
+def test_probes_run_concurrently(monkeypatch):
+    ports = [f"p{idx}" for idx in range(8)]
+    monkeypatch.setattr(scanner, "process_device",
+                        fake_process_device(dict.fromkeys(ports, 0.2)))
+
+    started = time.monotonic()
+    results = scanner.probe_devices(ports, timeout=1.0)
+
+    assert time.monotonic() - started < 0.6
+    assert [result.unwrap()["serial_number"] for result in results] == ports
+
+
+def test_queued_port_gets_its_own_deadline(monkeypatch):
+    # One worker: "slow" only starts after "fast" and must not inherit the
+    # time "fast" left over.
+    monkeypatch.setattr(scanner, "PROBE_WORKERS", 1)
+    monkeypatch.setattr(scanner, "process_device",
+                        fake_process_device({"fast": 0.05, "slow": 0.5}))
+
+    fast, slow = scanner.probe_devices(["fast", "slow"], timeout=0.3)
+
+    assert fast.is_ok()
+    assert slow.is_err()
+    assert "Timed out" in slow.unwrap_err()
+
+
+def test_port_after_expired_probe_is_still_probed(monkeypatch):
+    monkeypatch.setattr(scanner, "PROBE_WORKERS", 1)
+    monkeypatch.setattr(scanner, "process_device",
+                        fake_process_device({"slow": 0.4, "fast": 0.05}))
+
+    started = time.monotonic()
+    slow, fast = scanner.probe_devices(["slow", "fast"], timeout=0.3)
+
+    assert slow.is_err()
+    assert fast.is_ok()
+    assert time.monotonic() - started < 0.6
+
+
+def test_hung_ports_do_not_stall_the_scan(monkeypatch):
+    monkeypatch.setattr(scanner, "PROBE_WORKERS", 1)
+    monkeypatch.setattr(scanner, "process_device",
+                        fake_process_device({"hung": 2.0, "next": 0.0}))
+
+    started = time.monotonic()
+    hung, queued = scanner.probe_devices(["hung", "next"], timeout=0.2)
+
+    assert time.monotonic() - started < 0.6
+    assert "Timed out" in hung.unwrap_err()
+    assert "Not probed" in queued.unwrap_err()
+
+
+def test_identify_port_probes_once_then_uses_cache(monkeypatch, tmp_path):
+    from types import SimpleNamespace
+
+    from can_test.device_cache import DeviceCache
+
+    port_info = SimpleNamespace(device="/dev/ttyUSB7", location="1-1.2",
+                                serial_number="FT123", usb_device_path=None)
+    probed = []
+
+    def process_device(port):
+        probed.append(port)
+        return fake_process_device({port: 0.0})(port)
+
+    monkeypatch.setattr(scanner, "device_cache",
+                        DeviceCache(tmp_path / "devices.json"))
+    monkeypatch.setattr(scanner, "_port_info", lambda port: port_info)
+    monkeypatch.setattr(scanner, "process_device", process_device)
+
+    first = scanner.identify_port("/dev/ttyUSB7")
+    second = scanner.identify_port("/dev/ttyUSB7")
+
+    assert probed == ["/dev/ttyUSB7"]
+    assert first.unwrap() == second.unwrap()
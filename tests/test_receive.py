@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+import can
+import pytest
+
+from can_test.buspool import BusPool
+from can_test import receive
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = BusPool(lease_timeout=1.0)
+    monkeypatch.setattr(receive, "bus_pool", pool)
+    yield pool
+    pool.close()
+
+
+def pooled_bus(pool, port):
+    return pool._entries[port].bus
+
+
+def test_timeout_keeps_bus_in_pool(pool):
+    result = asyncio.run(receive.receive_image_async(
+        "rx-timeout", 100000, timeout=0.2, interface="virtual"))
+
+    assert "Kein vollständiges Bild" in result.unwrap_err()
+    assert pooled_bus(pool, "rx-timeout") is not None
+
+
+# python-can's notifier thread re-raises the error after recording it
+@pytest.mark.filterwarnings(
+    "ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_bus_error_discards_bus(pool, monkeypatch):
+    bus = pool.acquire("rx-error", 100000, interface="virtual")
+    pool.release("rx-error")
+
+    def broken(timeout):
+        # The pool drains with recv(0); only the notifier's reads fail
+        if timeout == 0:
+            return None, False
+        raise can.CanOperationError("Adapter abgezogen")
+
+    monkeypatch.setattr(bus, "_recv_internal", broken)
+    result = asyncio.run(receive.receive_image_async(
+        "rx-error", 100000, timeout=0.3, interface="virtual"))
+
+    assert "ausgefallen" in result.unwrap_err()
+    assert pooled_bus(pool, "rx-error") is None
+
+
+@pytest.mark.filterwarnings(
+    "ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_bus_error_fails_before_timeout(pool, monkeypatch):
+    bus = pool.acquire("rx-fast", 100000, interface="virtual")
+    pool.release("rx-fast")
+
+    def broken(timeout):
+        if timeout == 0:
+            return None, False
+        raise can.CanOperationError("Adapter abgezogen")
+
+    monkeypatch.setattr(bus, "_recv_internal", broken)
+    started = time.monotonic()
+    result = asyncio.run(receive.receive_image_async(
+        "rx-fast", 100000, timeout=5.0, interface="virtual"))
+
+    assert "ausgefallen" in result.unwrap_err()
+    assert time.monotonic() - started < 1.0
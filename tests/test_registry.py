@@ -0,0 +1,43 @@
+import socket
+import time
+
+from can_test import registry as registry_module
+from can_test.registry import UsbCanRegistry, is_relevant_uevent
+
+TTY_ADD = b"add@/devices/tty/ttyUSB0\0ACTION=add\0SUBSYSTEM=tty\0DEVNAME=ttyUSB0\0"
+
+
+def test_relevant_uevents():
+    assert is_relevant_uevent(TTY_ADD)
+    assert is_relevant_uevent(
+        b"add@/x\0SUBSYSTEM=usb\0PRODUCT=403/6015/1000\0")
+    assert not is_relevant_uevent(
+        b"add@/x\0SUBSYSTEM=usb\0PRODUCT=46d/c52b/1211\0")
+    assert not is_relevant_uevent(b"change@/x\0SUBSYSTEM=block\0")
+
+
+def test_replug_burst_refreshes_once(monkeypatch):
+    monkeypatch.setattr(registry_module, "DEBOUNCE", 0.1)
+    kernel, listener = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+    registry = UsbCanRegistry(poll_interval=0.1)
+    refreshes = []
+    monkeypatch.setattr(registry, "refresh",
+                        lambda: refreshes.append(time.monotonic()))
+    monkeypatch.setattr(registry, "_open_uevent_socket",
+                        lambda: listener.settimeout(0.1) or listener)
+    registry.start()
+    try:
+        time.sleep(0.05)
+        burst_start = time.monotonic()
+        for _ in range(8):
+            kernel.send(TTY_ADD)
+            time.sleep(0.02)
+        time.sleep(0.4)
+    finally:
+        registry.stop()
+        registry.join(1.0)
+        kernel.close()
+
+    # One refresh at start, one after the burst has been quiet
+    assert len(refreshes) == 2
+    assert refreshes[1] - burst_start < 0.4
@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+
+from can_test.scheduler import JobScheduler, JobTimeout
+
+
+def test_lower_priority_job_does_not_overtake_on_its_resources():
+    started = []
+
+    async def scenario():
+        scheduler = JobScheduler(workers=4)
+        release_a = asyncio.Event()
+
+        def job(name, event=None):
+            async def run():
+                started.append(name)
+                if event is not None:
+                    await event.wait()
+                else:
+                    await asyncio.sleep(0.01)
+                return name
+            return run
+
+        a = asyncio.ensure_future(scheduler.run(
+            "video", job("a", release_a), resources=["p1"]))
+        await asyncio.sleep(0)
+        # b waits for p1; the scan c only needs p2, which is free
+        b = asyncio.ensure_future(scheduler.run(
+            "video", job("b"), resources=["p1", "p2"]))
+        c = asyncio.ensure_future(scheduler.run(
+            "scan", job("c"), resources=["p2"]))
+        await asyncio.sleep(0.05)
+        assert started == ["a"]
+        assert scheduler.metrics()["queued"] == 2
+
+        release_a.set()
+        return await asyncio.gather(a, b, c)
+
+    assert asyncio.run(scenario()) == ["a", "b", "c"]
+    assert started == ["a", "b", "c"]
+
+
+def test_higher_priority_job_runs_first():
+    started = []
+
+    async def scenario():
+        scheduler = JobScheduler(workers=1)
+        gate = asyncio.Event()
+
+        def job(name):
+            async def run():
+                started.append(name)
+                await gate.wait()
+            return run
+
+        first = asyncio.ensure_future(scheduler.run("scan", job("first")))
+        await asyncio.sleep(0)
+        queued = [asyncio.ensure_future(scheduler.run(kind, job(kind)))
+                  for kind in ("scan", "video", "report")]
+        await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(first, *queued)
+
+    asyncio.run(scenario())
+
+    assert started == ["first", "report", "video", "scan"]
+
+
+def test_workers_bound_concurrent_jobs():
+    running = [0]
+    peak = [0]
+
+    async def job():
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.02)
+        running[0] -= 1
+
+    async def scenario():
+        scheduler = JobScheduler(workers=2)
+        await asyncio.gather(*(scheduler.run("video", job, resources=[f"p{n}"])
+                               for n in range(6)))
+        return scheduler.metrics()
+
+    metrics = asyncio.run(scenario())
+
+    assert peak[0] == 2
+    assert metrics["jobs"]["video"]["completed"] == 6
+
+
+def test_timeout_raises_and_frees_resources():
+    async def scenario():
+        scheduler = JobScheduler(workers=1)
+
+        async def hang():
+            await asyncio.sleep(10)
+
+        async def quick():
+            return "ok"
+
+        with pytest.raises(JobTimeout):
+            await scheduler.run("video", hang, resources=["p1"], timeout=0.05)
+        metrics = scheduler.metrics()
+        result = await asyncio.wait_for(
+            scheduler.run("video", quick, resources=["p1"]), 1.0)
+        return metrics, result
+
+    metrics, result = asyncio.run(scenario())
+
+    assert result == "ok"
+    assert metrics["busy"] == {}
+    assert metrics["running"] == 0
+    assert metrics["jobs"]["video"]["timed_out"] == 1
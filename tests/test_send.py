@@ -0,0 +1,50 @@
+import threading
+
+import can
+import pytest
+
+from can_test import send
+from can_test.buspool import BusPool
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = BusPool(lease_timeout=1.0)
+    monkeypatch.setattr(send, "bus_pool", pool)
+    yield pool
+    pool.close()
+
+
+def send_over_pool(**kwargs):
+    return send.send_image_over_can("tx", 1000000, threading.Event(),
+                                    interface="virtual", **kwargs)
+
+
+def test_image_is_sent(pool):
+    stats = send_over_pool(bus_load=1.0)
+
+    assert stats["frames"] == len(send.build_image_frames()[0])
+    assert pool._entries["tx"].bus is not None
+
+
+def test_error_outside_the_bus_keeps_it(pool, monkeypatch):
+    def broken_image(**kwargs):
+        raise OSError("colorbars.png fehlt")
+
+    monkeypatch.setattr(send, "build_image_frames", broken_image)
+
+    assert send_over_pool() is None
+    assert pool._entries["tx"].bus is not None
+
+
+def test_bus_error_discards_bus(pool, monkeypatch):
+    bus = pool.acquire("tx", 1000000, interface="virtual")
+    pool.release("tx")
+
+    def broken_send(msg, timeout=None):
+        raise can.CanOperationError("Adapter abgezogen")
+
+    monkeypatch.setattr(bus, "send", broken_send)
+
+    assert send_over_pool() is None
+    assert pool._entries["tx"].bus is None
@@ -0,0 +1,98 @@
+from types import SimpleNamespace
+
+import pytest
+
+from can_test import session as session_module
+from can_test.session import (PRUEFMITTEL_SERIALS, SessionStore, bench_of,
+                              pair_devices)
+
+PRUEFMITTEL = next(iter(PRUEFMITTEL_SERIALS))
+# Two benches, each behind its own hub
+LOCATIONS = {
+    "/dev/ttyUSB0": "1-1.1",
+    "/dev/ttyUSB1": "1-1.2",
+    "/dev/ttyUSB2": "1-2.1",
+    "/dev/ttyUSB3": "1-2.2",
+}
+
+
+class FakeRegistry(object):
+    def snapshot(self):
+        return {port: SimpleNamespace(device=port, location=location)
+                for port, location in LOCATIONS.items()}
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    monkeypatch.setattr(session_module, "registry", FakeRegistry())
+
+
+def device(port, serial_number):
+    return {"serial_number": serial_number, "firmware": "1:0",
+            "hardware": "1:0", "status": "success", "port": port}
+
+
+def both_benches():
+    return [device("/dev/ttyUSB0", PRUEFMITTEL), device("/dev/ttyUSB1", "111"),
+            device("/dev/ttyUSB2", PRUEFMITTEL), device("/dev/ttyUSB3", "222")]
+
+
+def station_ports(stations):
+    return [(station["pruefhilfsmittel"]["port"], station["pruefgeraet"]["port"])
+            for station in stations]
+
+
+def test_bench_is_the_hub():
+    assert bench_of("/dev/ttyUSB1") == "1-1"
+    assert bench_of("/dev/ttyUSB9") == ""
+
+
+def test_pairs_within_each_bench():
+    stations = pair_devices(both_benches()).unwrap()
+
+    assert station_ports(stations) == [("/dev/ttyUSB0", "/dev/ttyUSB1"),
+                                       ("/dev/ttyUSB2", "/dev/ttyUSB3")]
+
+
+def test_broken_adapter_only_drops_its_bench():
+    devices = both_benches()[:3]
+    failed = {"/dev/ttyUSB3": "Failed to identify the device"}
+
+    stations = pair_devices(devices, failed).unwrap()
+
+    assert station_ports(stations) == [("/dev/ttyUSB0", "/dev/ttyUSB1")]
+
+
+def test_unplugged_unit_only_drops_its_bench():
+    stations = pair_devices(both_benches()[:3]).unwrap()
+
+    assert station_ports(stations) == [("/dev/ttyUSB0", "/dev/ttyUSB1")]
+
+
+def test_error_when_no_complete_station_is_left():
+    devices = [device("/dev/ttyUSB0", PRUEFMITTEL)]
+    failed = {"/dev/ttyUSB3": "Failed to identify the device"}
+
+    error = pair_devices(devices, failed).unwrap_err()
+
+    assert "/dev/ttyUSB3: Failed to identify the device" in error
+    assert "Hub 1-1" in error
+
+
+def test_no_devices():
+    assert pair_devices([]).unwrap_err() == \
+        "Es wurden keine USB-CAN Geräte gefunden."
+
+
+def test_sessions_claim_distinct_stations():
+    stations = pair_devices(both_benches()).unwrap()
+    store = SessionStore()
+    first, second, third = (store.get(name) for name in ("a", "b", "c"))
+
+    assert store.claim_station(first, stations).is_ok()
+    assert store.claim_station(second, stations).is_ok()
+    assert store.claim_station(third, stations).is_err()
+    assert set(first.ports()).isdisjoint(second.ports())
+    # A new scan keeps the session's own station
+    before = second.station
+    assert store.claim_station(second, stations).unwrap() == before
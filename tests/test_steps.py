@@ -0,0 +1,54 @@
+import asyncio
+from types import SimpleNamespace
+
+from result import Err, Ok
+
+from can_test import session as session_module
+from can_test import steps
+from can_test.session import PRUEFMITTEL_SERIALS, SessionStore
+
+PRUEFMITTEL = next(iter(PRUEFMITTEL_SERIALS))
+LOCATIONS = {"/dev/ttyUSB0": "1-1.1", "/dev/ttyUSB1": "1-1.2",
+             "/dev/ttyUSB2": "1-2.1", "/dev/ttyUSB3": "1-2.2"}
+
+
+class FakeRegistry(object):
+    def snapshot(self):
+        return {port: SimpleNamespace(device=port, location=location)
+                for port, location in LOCATIONS.items()}
+
+    def ports(self):
+        return sorted(LOCATIONS)
+
+
+def found(serial_number):
+    return Ok({"serial_number": serial_number, "firmware": "1:0",
+               "hardware": "1:0", "status": "success"})
+
+
+def test_scan_claims_the_intact_bench(monkeypatch):
+    scan = {
+        "status": "success",
+        "ports": sorted(LOCATIONS),
+        "devices": [found(PRUEFMITTEL), found("111"), found(PRUEFMITTEL),
+                    Err({"port": "/dev/ttyUSB3", "status": "error",
+                         "error": "Failed to identify the device"})],
+    }
+
+    async def initialize_async(on_result, in_use):
+        return Ok(scan)
+
+    registry = FakeRegistry()
+    store = SessionStore()
+    monkeypatch.setattr(session_module, "registry", registry)
+    monkeypatch.setattr(steps, "start_registry", lambda: registry)
+    monkeypatch.setattr(steps, "initialize_async", initialize_async)
+    monkeypatch.setattr(steps, "sessions", store)
+
+    first, second = store.get("a"), store.get("b")
+    station = asyncio.run(steps.scan_station(first))
+
+    assert first.ports() == ["/dev/ttyUSB0", "/dev/ttyUSB1"]
+    assert station.is_ok()
+    assert asyncio.run(steps.scan_station(second)).unwrap_err() == \
+        "Alle Teststationen sind bereits belegt."
@@ -0,0 +1,63 @@
+import asyncio
+import time
+
+import pytest
+from result import Err, Ok
+
+from can_test.testplan import PlanStep, ordered_steps, run_plan
+
+
+def step(name, result=Ok(None), delay=0.0, **kwargs):
+    async def run():
+        await asyncio.sleep(delay)
+        return result
+    return PlanStep(name, run, **kwargs)
+
+
+def test_steps_are_ordered_by_dependencies():
+    steps = [step("report", after=["video"]), step("video", requires=["scan"]),
+             step("scan")]
+
+    assert [s.name for s in ordered_steps(steps)] == ["scan", "video", "report"]
+
+
+@pytest.mark.parametrize("steps, message", [
+    ([step("scan"), step("scan")], "doppelt"),
+    ([step("video", requires=["scan"])], "unbekannten"),
+    ([step("a", requires=["b"]), step("b", after=["a"])], "Zyklus"),
+])
+def test_invalid_plans_are_rejected(steps, message):
+    with pytest.raises(ValueError, match=message):
+        ordered_steps(steps)
+
+
+def test_step_is_skipped_when_required_step_failed():
+    ran = []
+
+    async def video():
+        ran.append("video")
+        return Ok(None)
+
+    steps = [step("scan", Err("Keine Teststation gefunden")),
+             PlanStep("video", video, requires=["scan"]),
+             step("report", after=["scan", "video"])]
+    summary = asyncio.run(run_plan(steps)).unwrap_err()
+
+    assert ran == []
+    assert summary["video"]["Status"] == "fail"
+    assert summary["video"]["Grund"] == "Übersprungen, da scan fehlgeschlagen"
+    # "after" only orders the steps, the report still runs
+    assert summary["report"]["Status"] == "pass"
+
+
+def test_independent_steps_overlap():
+    steps = [step("scan", delay=0.2), step("vga", delay=0.2),
+             step("video", delay=0.2, requires=["scan"])]
+
+    started = time.perf_counter()
+    summary = asyncio.run(run_plan(steps)).unwrap()
+    elapsed = time.perf_counter() - started
+
+    assert all(entry["Status"] == "pass" for entry in summary.values())
+    # longest chain is scan -> video, vga runs alongside
+    assert 0.4 <= elapsed < 0.55
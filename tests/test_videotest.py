@@ -0,0 +1,42 @@
+import asyncio
+import time
+
+import can
+import pytest
+
+from can_test import videotest
+from can_test.buspool import BusPool
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = BusPool(lease_timeout=1.0)
+    monkeypatch.setattr(videotest, "bus_pool", pool)
+    yield pool
+    pool.close()
+
+
+def test_duplex_reports_receiver_that_fails_before_listening(pool,
+                                                             monkeypatch):
+    async def receive_image_on_bus(bus, port, timeout, ready, path):
+        if port == "dut":
+            # Like bus.fileno() on an unplugged adapter
+            raise can.CanOperationError("Adapter abgezogen")
+        ready.set()
+        await asyncio.sleep(timeout)
+
+    monkeypatch.setattr(videotest, "receive_image_on_bus",
+                        receive_image_on_bus)
+    first = {"name": "Prüfgerät", "port": "dut"}
+    second = {"name": "Prüfmittel", "port": "ref"}
+
+    started = time.monotonic()
+    result_1, result_2 = asyncio.run(videotest.run_duplex_video_test(
+        first, second, timeout=5.0, interface="virtual"))
+
+    assert time.monotonic() - started < 1.0
+    assert "Adapter abgezogen" in result_1.unwrap_err()
+    assert result_1.unwrap_err().startswith("Prüfgerät")
+    assert result_2 == result_1
+    assert pool._entries["dut"].bus is None
+    assert pool._entries["ref"].bus is not None